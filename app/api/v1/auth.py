@@ -1,14 +1,16 @@
 from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.params import Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...conf.config import get_db
+from ...conf.limiter import limiter
 from ...schemas.users import UserRegisterSchema, UserResponseSchema, TokenModel, TokenRefreshRequest, PasswordResetRequest, PasswordResetConfirm
 from ...repositories.auth import auth_repository
 from ...services.auth import auth_service
 from ...services.email import send_email, send_password_reset_email
 from ...services.cache import cache_service
+from ...services.jobs import job_queue
 
 """Authentication API router.
 
@@ -20,42 +22,50 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post(
     "/signup",
-    response_model=UserResponseSchema
+    response_model=UserResponseSchema,
+    dependencies=[Depends(limiter.limit("signup"))],
 )
 async def signup(
         body: UserRegisterSchema,
         background_tasks: BackgroundTasks,
         request: Request,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
-    """Register a new user and send a confirmation email."""
+    """Register a new user and send a confirmation email.
+
+    The email goes through the job queue (in-process if it is unavailable).
+    """
     user = await auth_repository.get_user_by_email(body.email, db)
     if user is not None:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User with this email already exists")
 
-    body.password = auth_service.hash_password(body.password)
+    body.password = await auth_service.hash_password(body.password)
 
     user = await auth_repository.create_user(body, db)
-    background_tasks.add_task(
-        send_email,
-        user.email,
-        user.username,
-        request.base_url
-    )
+    if not await job_queue.enqueue("send_email", email=user.email, username=user.username, host=str(request.base_url)):
+        background_tasks.add_task(
+            send_email,
+            user.email,
+            user.username,
+            request.base_url
+        )
     return user
 
 
-@router.post("/login", response_model=TokenModel)
+@router.post("/login", response_model=TokenModel, dependencies=[Depends(limiter.limit("login"))])
 async def signup(
         body: OAuth2PasswordRequestForm = Depends(),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
     """Log in with email and password and receive access/refresh tokens."""
-    user = await auth_repository.get_user_by_email(body.username, db)
+    # The user is cached below, so read it from the primary (see get_current_user)
+    since = await cache_service.read_stamp()
+    user = await auth_repository.get_user_by_email(body.username, db, read_replica=False)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
-    if not auth_service.verify_password(body.password, user.password):
+    valid, new_hash = await auth_service.verify_and_update_password(body.password, user.password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect password")
 
     if not user.confirmed:
@@ -64,10 +74,13 @@ async def signup(
     access_token = await auth_service.create_access_token(payload={"sub": user.email})
     refresh_token = await auth_service.create_refresh_token(payload={"sub": user.email})
     user.refresh_token = refresh_token
-    db.commit()
+    if new_hash:
+        # Stored hash predates the configured scheme/cost: upgrade it now
+        user.password = new_hash
+    await db.commit()
 
     # Cache current user by access token
-    await cache_service.set_user_for_token(access_token, user)
+    await cache_service.set_user_for_token(access_token, user, since)
 
     return {
         "access_token": access_token,
@@ -77,9 +90,10 @@ async def signup(
 
 
 @router.post('/refresh-token', response_model=TokenModel)
-async def get_new_refresh_token(request: TokenRefreshRequest, db: Session = Depends(get_db)):
+async def get_new_refresh_token(request: TokenRefreshRequest, db: AsyncSession = Depends(get_db)):
     """Create a new access token from a valid refresh token."""
-    user = auth_service.verify_refresh_token(request.refresh_token, db)
+    since = await cache_service.read_stamp()
+    user = await auth_service.verify_refresh_token(request.refresh_token, db)
 
     if user is None:
         raise HTTPException(
@@ -90,7 +104,7 @@ async def get_new_refresh_token(request: TokenRefreshRequest, db: Session = Depe
     new_access_token = await auth_service.create_access_token(payload={"sub": user.email})
 
     # Refresh cache for new access token
-    await cache_service.set_user_for_token(new_access_token, user)
+    await cache_service.set_user_for_token(new_access_token, user, since)
 
     return {
         "access_token": new_access_token,
@@ -100,7 +114,7 @@ async def get_new_refresh_token(request: TokenRefreshRequest, db: Session = Depe
 
 
 @router.get("/confirmed_email/{token}")
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """Confirm user email using a token from the verification email."""
     email = await auth_service.get_user_by_email_token(token)
     user = await auth_repository.get_user_by_email(email, db)
@@ -116,7 +130,7 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
 
 
 @router.post("/password-reset/request")
-async def request_password_reset(body: PasswordResetRequest, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def request_password_reset(body: PasswordResetRequest, background_tasks: BackgroundTasks, request: Request, db: AsyncSession = Depends(get_db)):
     """Request a password reset and send a reset token via email.
 
     For security, respond with 200 even if user not found.
@@ -128,12 +142,16 @@ async def request_password_reset(body: PasswordResetRequest, background_tasks: B
 
     reset_token = await auth_service.create_reset_token({"sub": user.email})
     await cache_service.set_password_reset_token(reset_token, user.email)
-    background_tasks.add_task(send_password_reset_email, user.email, user.username, request.base_url, reset_token)
+    if not await job_queue.enqueue(
+        "send_password_reset_email",
+        email=user.email, username=user.username, host=str(request.base_url), reset_token=reset_token,
+    ):
+        background_tasks.add_task(send_password_reset_email, user.email, user.username, request.base_url, reset_token)
     return {"message": "If the account exists, an email has been sent"}
 
 
 @router.post("/password-reset/confirm")
-async def confirm_password_reset(body: PasswordResetConfirm, db: Session = Depends(get_db)):
+async def confirm_password_reset(body: PasswordResetConfirm, db: AsyncSession = Depends(get_db)):
     """Reset password using a valid reset token. Token is single-use."""
     # Validate token structure and subject
     try:
@@ -150,6 +168,5 @@ async def confirm_password_reset(body: PasswordResetConfirm, db: Session = Depen
     if user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    user.password = auth_service.hash_password(body.new_password)
-    db.commit()
+    await auth_repository.update_password(user, await auth_service.hash_password(body.new_password), db)
     return {"message": "Password updated"}
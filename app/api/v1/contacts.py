@@ -1,25 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from ...conf.config import engine, get_db
+from datetime import date
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...conf.config import engine, get_db, get_session_factory
+from ...conf.limiter import limiter
 from ...db.base import Base
-from ...schemas.contacts import ContactCreate, ContactUpdate, ContactRead
+from ...schemas.contacts import (
+    ContactCreate, ContactUpdate, ContactRead, ContactImportReport,
+    ContactBulkSelection, ContactBulkUpdate, ContactBulkResult,
+)
 from ...repositories.contacts import (
-    contacts_repository
+    READ_COLUMNS, contacts_repository
 )
 from ...services.auth import auth_service
+from ...services.contacts_cache import contacts_cache
+from ...services.contacts_export import MEDIA_TYPES, export_contacts
+from ...services.contacts_import import import_contacts, import_format
+from ...services.etag import conditional_response, make_etag, not_modified
 
 """Contacts API router.
 
 Provides CRUD endpoints for managing contacts and a helper endpoint for
-upcoming birthdays. All endpoints require authentication.
+upcoming birthdays. All endpoints require authentication. Reads are
+served through the contacts read cache as pre-rendered JSON and carry
+strong ETags: single contacts from their row version, lists from the
+collection version. ``If-None-Match`` is answered with 304.
 """
 
 router = APIRouter(tags=["contacts"], prefix="/contacts", dependencies=[Depends(auth_service.get_current_user)])
 
 Base.metadata.create_all(engine)
 
-@router.post("/", response_model=ContactRead, status_code=status.HTTP_201_CREATED)
-def create_contact_ep(payload: ContactCreate, db: Session = Depends(get_db)):
+write_limit = [Depends(limiter.limit("contacts_write"))]
+
+contact_adapter = TypeAdapter(ContactRead)
+
+
+def render_rows(rows) -> bytes:
+    """Serialize `READ_COLUMNS` rows straight to the JSON of a list response.
+
+    Rows come from the database already valid, so they skip ORM hydration
+    and `ContactRead` validation; the output is byte-identical to it.
+    """
+    return orjson.dumps([row._asdict() for row in rows])
+
+
+def cached_response(request: Request, body: bytes | None, headers: dict[str, str]) -> Response:
+    """Turn a contacts cache result into a 200 or a 304 response."""
+    if body is None:
+        return not_modified(headers["ETag"])
+    return conditional_response(request, body, headers)
+
+
+@router.post("/", response_model=ContactRead, status_code=status.HTTP_201_CREATED, dependencies=write_limit)
+async def create_contact_ep(payload: ContactCreate, db: AsyncSession = Depends(get_db)):
     """Create a new contact.
 
     Args:
@@ -28,46 +66,146 @@ def create_contact_ep(payload: ContactCreate, db: Session = Depends(get_db)):
     Returns:
         The created contact.
     """
-    return contacts_repository.create_contact(db, payload)
+    return await contacts_repository.create_contact(db, payload)
+
+@router.post("/import", response_model=ContactImportReport, dependencies=write_limit)
+async def import_contacts_ep(
+    request: Request,
+    on_conflict: Literal["skip", "update"] = Query(
+        default="skip", description="keep (skip) or overwrite (update) contacts whose email already exists"
+    ),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(auth_service.get_current_user),
+):
+    """Bulk-import contacts from a CSV or NDJSON request body.
+
+    The body is streamed and written in batches, so uploads of any size
+    run in bounded memory. CSV needs a header row naming `ContactCreate`
+    fields; rows without ``user_id`` belong to the caller. Invalid rows
+    are skipped and listed, by line, in the report.
+    """
+    fmt = import_format(request.headers.get("content-type"))
+    return await import_contacts(db, request.stream(), fmt, on_conflict, user.id)
 
 @router.get("/", response_model=list[ContactRead])
-def list_contacts_ep(
-    db: Session = Depends(get_db),
+async def list_contacts_ep(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     search: str | None = Query(default=None, description="free text: first_name/last_name/email"),
     first_name: str | None = None,
     last_name: str | None = None,
     email: str | None = None,
     skip: int = 0,
-    limit: int = Query(100, le=500)
+    limit: int = Query(100, le=500),
+    cursor: str | None = Query(default=None, description="opaque cursor from the X-Next-Cursor header; overrides skip"),
+    sort: Literal["relevance", "id", "first_name", "last_name", "email", "birthday"] | None = Query(
+        default=None, description="defaults to relevance when searching, id otherwise"
+    ),
 ):
-    """List contacts with optional filters and pagination."""
-    return contacts_repository.list_contacts(db, search, first_name, last_name, email, skip, limit)
+    """List contacts with optional filters and pagination.
+
+    The cursor of the next page, if any, is returned in the
+    ``X-Next-Cursor`` response header.
+    """
+    async def load():
+        rows = await contacts_repository.list_contacts(
+            db, search, first_name, last_name, email, skip, limit, cursor, sort, columns=READ_COLUMNS
+        )
+        next_cursor = contacts_repository.next_cursor(
+            rows, contacts_repository.resolve_sort(search, sort), limit
+        )
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return render_rows(rows), headers
+
+    params = {
+        "search": search, "first_name": first_name, "last_name": last_name, "email": email,
+        "skip": skip, "limit": limit, "cursor": cursor, "sort": sort,
+    }
+    return cached_response(request, *await contacts_cache.read_through(
+        "list", params, contacts_cache.list_ttl_seconds, load,
+        if_none_match=request.headers.get("if-none-match"), content_etag=True,
+    ))
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_contacts_ep(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    search: str | None = Query(default=None, description="free text: first_name/last_name/email"),
+    first_name: str | None = None,
+    last_name: str | None = None,
+    email: str | None = None,
+    session_factory=Depends(get_session_factory),
+):
+    """Stream every contact matching the list filters, ordered by id.
+
+    Memory use is constant regardless of the number of contacts.
+    """
+    return StreamingResponse(
+        export_contacts(session_factory, format, search, first_name, last_name, email),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{format}"'},
+    )
+
+@router.patch("/bulk", response_model=ContactBulkResult, dependencies=write_limit)
+async def bulk_update_contacts_ep(payload: ContactBulkUpdate, db: AsyncSession = Depends(get_db)):
+    """Apply `changes` to every contact selected by `ids` or `filters`.
+
+    Runs as a single ``UPDATE ... RETURNING`` statement in one transaction.
+    """
+    updated = await contacts_repository.bulk_update_contacts(db, payload.changes, payload.ids, payload.filters)
+    return {"affected": len(updated), "ids": updated}
+
+@router.delete("/bulk", response_model=ContactBulkResult, dependencies=write_limit)
+async def bulk_delete_contacts_ep(payload: ContactBulkSelection, db: AsyncSession = Depends(get_db)):
+    """Delete every contact selected by `ids` or `filters`.
+
+    Runs as a single ``DELETE ... RETURNING`` statement in one transaction.
+    """
+    deleted = await contacts_repository.bulk_delete_contacts(db, payload.ids, payload.filters)
+    return {"affected": len(deleted), "ids": deleted}
 
 @router.get("/{contact_id}", response_model=ContactRead)
-def get_contact_ep(contact_id: int, db: Session = Depends(get_db)):
+async def get_contact_ep(request: Request, contact_id: int, db: AsyncSession = Depends(get_db)):
     """Get a single contact by id."""
-    obj = contacts_repository.get_contact(db, contact_id)
-    if not obj:
-        raise HTTPException(status_code=404, detail="Contact not found")
-    return obj
+    async def load():
+        obj = await contacts_repository.get_contact(db, contact_id)
+        if not obj:
+            raise HTTPException(status_code=404, detail="Contact not found")
+        body = contact_adapter.dump_json(contact_adapter.validate_python(obj, from_attributes=True))
+        return body, {"ETag": make_etag("contact", obj.id, obj.version)}
 
-@router.put("/{contact_id}", response_model=ContactRead)
-def update_contact_ep(contact_id: int, payload: ContactUpdate, db: Session = Depends(get_db)):
+    return cached_response(request, *await contacts_cache.read_through(
+        "item", {"id": contact_id}, contacts_cache.item_ttl_seconds, load
+    ))
+
+@router.put("/{contact_id}", response_model=ContactRead, dependencies=write_limit)
+async def update_contact_ep(contact_id: int, payload: ContactUpdate, db: AsyncSession = Depends(get_db)):
     """Update an existing contact by id."""
-    obj = contacts_repository.update_contact(db, contact_id, payload)
+    obj = await contacts_repository.update_contact(db, contact_id, payload)
     if not obj:
         raise HTTPException(status_code=404, detail="Contact not found")
     return obj
 
-@router.delete("/{contact_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_contact_ep(contact_id: int, db: Session = Depends(get_db)):
+@router.delete("/{contact_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=write_limit)
+async def delete_contact_ep(contact_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a contact by id."""
-    ok = contacts_repository.delete_contact(db, contact_id)
+    ok = await contacts_repository.delete_contact(db, contact_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Contact not found")
     return
 
 @router.get("/upcoming/birthdays", response_model=list[ContactRead])
-def birthdays_next_7_days_ep(db: Session = Depends(get_db)):
-    """List contacts with birthdays in the next 7 days."""
-    return contacts_repository.birthdays_next_7_days(db)
+async def birthdays_next_7_days_ep(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    days: int = Query(7, ge=1, le=366, description="size of the window after today"),
+):
+    """List contacts with birthdays in the next `days` days (7 by default)."""
+    today = date.today()
+
+    async def load():
+        return render_rows(await contacts_repository.upcoming_birthdays(db, days, today=today, columns=READ_COLUMNS)), {}
+
+    return cached_response(request, *await contacts_cache.read_through(
+        "birthdays", {"days": days, "today": today.isoformat()}, contacts_cache.list_ttl_seconds, load,
+        if_none_match=request.headers.get("if-none-match"), content_etag=True,
+    ))
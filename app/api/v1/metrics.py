@@ -0,0 +1,17 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.params import Depends
+
+from ...schemas.users import UserResponseSchema
+from ...services.auth import auth_service
+from ...services.metrics import metrics
+
+"""Metrics API router exposing this worker's in-process metrics to admins."""
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/")
+async def get_metrics(user: UserResponseSchema = Depends(auth_service.get_current_user)):
+    """Return counters, gauges and timing summaries of the current worker."""
+    if getattr(user, "role", "user") != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can read metrics")
+    return metrics.snapshot()
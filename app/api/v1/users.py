@@ -1,40 +1,53 @@
-from fastapi import APIRouter, HTTPException, status, Request, UploadFile
+from fastapi import APIRouter, HTTPException, status, Request, Response, UploadFile
 from fastapi.params import Depends, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...schemas.users import UserResponseSchema
 from ...services.auth import auth_service
 from ...repositories.auth import auth_repository
 from ...conf.limiter import limiter
-from ...conf.config import app_settings, get_db
-from ...services.upload_file import UploadFileService
+from ...conf.config import get_db
+from ...services.etag import CACHE_CONTROL, etag_matches, make_etag, not_modified
+from ...services.upload_file import upload_service
 
 """Users API router providing endpoints for profile info and avatar updates."""
 router = APIRouter(prefix="/users", tags=["users"])
 
 
-@router.get("/me", response_model=UserResponseSchema)
-@limiter.limit("10/second")
-async def me(request: Request, user: UserResponseSchema = Depends(auth_service.get_current_user)):
-    """Return the current authenticated user's public info."""
+@router.get("/me", response_model=UserResponseSchema, dependencies=[Depends(limiter.limit("me"))])
+async def me(request: Request, response: Response, user: UserResponseSchema = Depends(auth_service.get_current_user)):
+    """Return the current authenticated user's public info.
+
+    The ETag covers the returned fields, so ``If-None-Match`` gets a 304
+    straight from the (usually cached) authenticated user.
+    """
+    etag = make_etag("user", user.username, user.email, getattr(user, "role", None))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
     return user
 
 @router.patch("/avatar", response_model=UserResponseSchema)
 async def update_user_avatar(
         file: UploadFile = File(),
         user: UserResponseSchema = Depends(auth_service.get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ):
-    """Update user's avatar; only admins are allowed to change avatar."""
+    """Update user's avatar; only admins are allowed to change avatar.
+
+    The image is resized to a 200x200 thumbnail and stored off the event loop,
+    unless the same image is already stored or is the current avatar.
+    """
     if getattr(user, "role", "user") != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can update their avatar")
 
-    avatar_url = UploadFileService(
-        app_settings.CLOUDINARY_NAME,
-        app_settings.CLOUDINARY_API_KEY,
-        app_settings.CLOUDINARY_API_SECRET
-    ).upload_file(file, user.username)
+    stored = await upload_service.upload_avatar(file, await auth_repository.get_avatar_hash(user.id, db))
+    if stored is None:
+        # Same image as the current avatar: nothing to upload or write
+        return user
+    avatar_url, avatar_hash = stored
 
-    user = await auth_repository.update_avatar_url(user.email, avatar_url, db)
+    user = await auth_repository.update_avatar_url(user.email, avatar_url, db, avatar_hash)
 
     return user
\ No newline at end of file
@@ -1,9 +1,14 @@
+from typing import Literal
+
 from pydantic import EmailStr
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from ..db.routing import ReplicaSet, RoutingAsyncSession, RoutingSession
+
 """Application configuration and database session factory."""
 
 class Settings(BaseSettings):
@@ -12,6 +17,18 @@ class Settings(BaseSettings):
     APP_NAME: str
     SECRET_KEY: str
 
+    # Connection pool of the async engine (ignored for SQLite)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Comma-separated read replica URLs; empty means every query hits the primary
+    DATABASE_REPLICA_URLS: str = ""
+    DATABASE_REPLICA_RETRY_SECONDS: float = 30
+    DATABASE_REPLICA_HEALTH_INTERVAL: float = 10
+
     MAIL_USERNAME: str
     MAIL_PASSWORD: str
     MAIL_FROM: EmailStr
@@ -22,26 +39,156 @@ class Settings(BaseSettings):
     MAIL_SSL_TLS: bool
     USE_CREDENTIALS: bool
     VALIDATE_CERTS: bool
+    # Outgoing mail: pooled SMTP connections fed by a batching queue
+    MAIL_POOL_SIZE: int = 4
+    MAIL_QUEUE_SIZE: int = 10000
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_MAX_ATTEMPTS: int = 5
+    MAIL_RETRY_BASE_SECONDS: float = 1
 
     CLOUDINARY_NAME: str
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
 
+    # Avatar storage: "cloudinary", "local" (served at LOCAL_STORAGE_URL) or "s3"
+    STORAGE_BACKEND: Literal["cloudinary", "local", "s3"] = "cloudinary"
+    AVATAR_MAX_BYTES: int = 5 * 1024 * 1024
+    UPLOAD_WORKERS: int = 4
+    LOCAL_STORAGE_PATH: str = "media"
+    LOCAL_STORAGE_URL: str = "/media"
+    S3_BUCKET: str = ""
+    S3_ENDPOINT_URL: str = ""
+    S3_REGION: str = ""
+    S3_PUBLIC_URL: str = ""
+
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5
+    REDIS_SOCKET_TIMEOUT: float = 2
+    REDIS_CONNECT_TIMEOUT: float = 2
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+
+    # In-process cache of verified access tokens (per worker)
+    AUTH_L1_CACHE_SIZE: int = 10000
+    AUTH_L1_CACHE_TTL: float = 60
+    # Lifetime of the per-user payload in Redis; writes invalidate it explicitly
+    AUTH_USER_CACHE_TTL: int = 60 * 60
+
+    # Read-through cache of contact responses; writes retire entries. If a retirement is lost
+    # to a Redis error, the entry (and its ETag) stays stale until its TTL expires
+    CONTACTS_CACHE_ENABLED: bool = True
+    CONTACTS_CACHE_ITEM_TTL: int = 5 * 60
+    CONTACTS_CACHE_LIST_TTL: int = 60
+
+    # Bulk import: rows per INSERT statement/transaction, errors listed in the report
+    CONTACTS_IMPORT_BATCH_SIZE: int = 500
+    CONTACTS_IMPORT_MAX_ERRORS: int = 100
+    # Rows fetched per server-side cursor round trip by the streaming export
+    CONTACTS_EXPORT_BATCH_SIZE: int = 1000
+
+    # Response compression: bodies below the threshold are sent as is; only
+    # media types listed here are compressed, at a 1-9 level (JSON env var)
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_LEVELS: dict[str, int] = {
+        "application/json": 6,
+        "application/x-ndjson": 4,
+        "text/csv": 4,
+        "text/plain": 6,
+        "text/html": 6,
+    }
+
+    # Background jobs on a Redis stream, run by `python -m app.worker`
+    JOBS_ENABLED: bool = True
+    JOBS_STREAM_MAXLEN: int = 100000
+    JOBS_CONCURRENCY: int = 8
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_RETRY_BASE_SECONDS: float = 2
+    # Must exceed the longest retry backoff, or waiting retries get reclaimed
+    JOBS_CLAIM_IDLE_SECONDS: float = 60
+
+    # Token buckets in Redis shared by all workers, as "<requests>/<second|minute|hour|day>"
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LOGIN: str = "10/minute"
+    RATE_LIMIT_SIGNUP: str = "5/hour"
+    RATE_LIMIT_CONTACTS_WRITE: str = "120/minute"
+    RATE_LIMIT_ME: str = "10/second"
+    # Share of a bucket a worker may lease to serve calls without Redis; 0 disables
+    RATE_LIMIT_LEASE_FRACTION: float = 0.1
+    RATE_LIMIT_LEASE_SECONDS: float = 1
+
+    # Password hashing runs on a bounded thread pool off the event loop
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    # Hash cost; pick values with `python -m app.tools.calibrate_hashing`
+    PASSWORD_HASH_SCHEME: Literal["bcrypt", "argon2"] = "bcrypt"
+    BCRYPT_ROUNDS: int = 12
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 4
 
     model_config = SettingsConfigDict(env_file=".env")
 
 app_settings = Settings()
 
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Return `url` rewritten to use the async driver of its backend.
+
+    URLs that already name an async driver are returned unchanged, so both
+    ``postgresql+psycopg2://`` and ``postgresql+asyncpg://`` are accepted.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None or parsed.drivername in ("postgresql+asyncpg", "sqlite+aiosqlite"):
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def create_app_engine(url: str):
+    """Create an async engine with the pool configured from settings."""
+    async_url = to_async_url(url)
+    if make_url(async_url).get_backend_name() == "sqlite":
+        return create_async_engine(async_url)
+    return create_async_engine(
+        async_url,
+        pool_size=app_settings.DB_POOL_SIZE,
+        max_overflow=app_settings.DB_MAX_OVERFLOW,
+        pool_timeout=app_settings.DB_POOL_TIMEOUT,
+        pool_recycle=app_settings.DB_POOL_RECYCLE,
+        pool_pre_ping=app_settings.DB_POOL_PRE_PING,
+    )
+
+
+# Synchronous engine, used for schema management (create_all / migrations) only
 engine = create_engine(app_settings.DATABASE_URL)
-Session = sessionmaker(engine)
-session = Session()
 
-def get_db():
-    """Yield a request-scoped database session."""
-    db = session
-    try:
+async_engine = create_app_engine(app_settings.DATABASE_URL)
+replicas = ReplicaSet(
+    [create_app_engine(url.strip()) for url in app_settings.DATABASE_REPLICA_URLS.split(",") if url.strip()],
+    retry_after=app_settings.DATABASE_REPLICA_RETRY_SECONDS,
+)
+SessionLocal = async_sessionmaker(
+    async_engine,
+    class_=RoutingAsyncSession,
+    sync_session_class=RoutingSession,
+    expire_on_commit=False,
+    info={"replicas": replicas},
+)
+
+
+async def get_db():
+    """Yield a request-scoped async database session drawn from the pool."""
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
+
+def get_session_factory():
+    """Return the session factory, for streaming responses that must open
+    their own session: `get_db` closes before the response body is sent."""
+    return SessionLocal
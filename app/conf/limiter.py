@@ -1,8 +1,213 @@
-"""Rate limiting configuration using SlowAPI.
+import logging
+import math
+import time
 
-Exposes a `limiter` instance with client IP based key function.
+from fastapi import Request
+from jose import JWTError, jwt
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import app_settings
+from .redis import redis_client
+from ..services.cache import LocalTTLCache
+from ..services.metrics import metrics
+
+"""Distributed rate limiting with Redis token buckets.
+
+Every worker draws from the same bucket per policy and caller, updated
+atomically by a Lua script. Callers are identified by the subject of a
+valid access token and fall back to the client IP. Routes opt in with
+``Depends(limiter.limit("<policy>"))``; `RateLimitHeadersMiddleware`
+adds the ``RateLimit-*`` headers to their responses.
+"""
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Refill, then take up to ARGV[3] tokens if at least one is available.
+# ARGV[1] is the capacity, ARGV[2] the refill rate in tokens per second.
+# Returns {granted, remaining, ms until full, ms until the next token}.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local last = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local granted = 0
+if tokens >= 1 then
+    granted = math.min(wanted, math.floor(tokens))
+    tokens = tokens - granted
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {granted, math.floor(tokens), math.ceil((capacity - tokens) / rate * 1000),
+        math.ceil(math.max(0, 1 - tokens) / rate * 1000)}
 """
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 
-limiter = Limiter(key_func=get_remote_address)
\ No newline at end of file
+
+class RateLimitPolicy:
+    """A bucket of `limit` requests refilled evenly over `period` seconds.
+
+    `key` is ``subject`` (authenticated user, else IP) or ``ip``.
+    """
+
+    def __init__(self, name: str, rate: str, key: str = "subject") -> None:
+        limit, _, period = rate.partition("/")
+        self.name = name
+        self.limit = int(limit)
+        self.period = PERIODS[period.strip()]
+        self.rate = self.limit / self.period
+        self.key = key
+
+
+class RateLimitState:
+    """Outcome of one check, rendered as ``RateLimit-*`` headers."""
+
+    def __init__(self, policy: RateLimitPolicy, allowed: bool, remaining: int, reset: float, retry_after: float = 0) -> None:
+        self.policy = policy
+        self.allowed = allowed
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.policy.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "RateLimit-Policy": f"{self.policy.limit};w={self.policy.period}",
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, state: RateLimitState) -> None:
+        super().__init__(f"Rate limit {state.policy.name} exceeded")
+        self.state = state
+
+
+class Lease:
+    """Tokens taken from Redis ahead of time and spent by this worker."""
+    __slots__ = ("tokens", "remaining", "reset_at")
+
+    def __init__(self, tokens: int, remaining: int, reset_at: float) -> None:
+        self.tokens = tokens
+        self.remaining = remaining
+        self.reset_at = reset_at
+
+
+class RateLimiter:
+    """Token-bucket limiter shared by all workers through Redis.
+
+    For policies with room for it, a worker leases a slice of the bucket
+    (`RATE_LIMIT_LEASE_FRACTION` of the limit) and serves the next calls
+    of that caller locally, skipping the Redis hop for callers well under
+    their limit. Unused leased tokens lapse after `RATE_LIMIT_LEASE_SECONDS`,
+    so leasing can only make the limit stricter, never looser. Redis
+    errors let requests through.
+    """
+
+    def __init__(self, client: Redis | None = None) -> None:
+        self.client: Redis = client or redis_client
+        self.enabled = app_settings.RATE_LIMIT_ENABLED
+        self.prefix = "ratelimit:"
+        self.policies = {
+            "login": RateLimitPolicy("login", app_settings.RATE_LIMIT_LOGIN, key="ip"),
+            "signup": RateLimitPolicy("signup", app_settings.RATE_LIMIT_SIGNUP, key="ip"),
+            "contacts_write": RateLimitPolicy("contacts_write", app_settings.RATE_LIMIT_CONTACTS_WRITE),
+            "me": RateLimitPolicy("me", app_settings.RATE_LIMIT_ME),
+        }
+        self.lease_fraction = app_settings.RATE_LIMIT_LEASE_FRACTION
+        self.leases = LocalTTLCache(maxsize=10000, ttl=app_settings.RATE_LIMIT_LEASE_SECONDS)
+        self._script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    @staticmethod
+    def client_ip(request: Request) -> str:
+        return request.client.host if request.client else "unknown"
+
+    def caller(self, request: Request, policy: RateLimitPolicy) -> str:
+        """Return the bucket owner: ``user:<sub>`` or ``ip:<address>``."""
+        if policy.key == "subject":
+            scheme, _, token = request.headers.get("authorization", "").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    subject = jwt.decode(token, app_settings.SECRET_KEY).get("sub")
+                except JWTError:
+                    subject = None
+                if subject:
+                    return f"user:{subject}"
+        return f"ip:{self.client_ip(request)}"
+
+    async def hit(self, policy: RateLimitPolicy, caller: str) -> RateLimitState:
+        """Take one token from the caller's bucket."""
+        key = f"{self.prefix}{policy.name}:{caller}"
+        lease = self.leases.get(key)
+        if lease is not None and lease.tokens > 0:
+            lease.tokens -= 1
+            metrics.incr("rate_limit_local_hits")
+            return RateLimitState(policy, True, lease.remaining + lease.tokens, max(0.0, lease.reset_at - time.time()))
+
+        wanted = max(1, int(policy.limit * self.lease_fraction))
+        try:
+            granted, remaining, reset_ms, retry_ms = await self._script(
+                keys=[key], args=[policy.limit, policy.rate, wanted]
+            )
+        except RedisError:
+            logger.warning("Rate limiter unavailable, allowing request", exc_info=True)
+            metrics.incr("rate_limit_errors")
+            return RateLimitState(policy, True, policy.limit, 0)
+        if not granted:
+            metrics.incr("rate_limit_rejected")
+            return RateLimitState(policy, False, 0, reset_ms / 1000, retry_ms / 1000)
+        if granted > 1:
+            self.leases.set(key, Lease(granted - 1, remaining, time.time() + reset_ms / 1000))
+        return RateLimitState(policy, True, remaining + granted - 1, reset_ms / 1000)
+
+    def limit(self, name: str):
+        """Return a dependency enforcing policy `name` on a route."""
+        policy = self.policies[name]
+
+        async def dependency(request: Request) -> None:
+            if not self.enabled:
+                return
+            state = await self.hit(policy, self.caller(request, policy))
+            request.state.rate_limit = state
+            if not state.allowed:
+                raise RateLimitExceeded(state)
+
+        return dependency
+
+
+class RateLimitHeadersMiddleware:
+    """Copy the rate limit state of a request into its response headers."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                state = scope.get("state", {}).get("rate_limit")
+                if state is not None:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        *((name.lower().encode(), value.encode()) for name, value in state.headers().items()),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+limiter = RateLimiter()
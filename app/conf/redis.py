@@ -0,0 +1,26 @@
+from redis.asyncio import BlockingConnectionPool, Redis
+
+from .config import app_settings
+
+"""Shared Redis client with a bounded, health-checked connection pool."""
+
+
+def create_redis(url: str) -> Redis:
+    """Create a client whose pool is sized and timed from settings.
+
+    The pool blocks for up to `REDIS_POOL_TIMEOUT` seconds when all
+    `REDIS_MAX_CONNECTIONS` connections are busy instead of opening more,
+    so load spikes reuse connections rather than churning them.
+    """
+    pool = BlockingConnectionPool.from_url(
+        url,
+        max_connections=app_settings.REDIS_MAX_CONNECTIONS,
+        timeout=app_settings.REDIS_POOL_TIMEOUT,
+        socket_timeout=app_settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=app_settings.REDIS_CONNECT_TIMEOUT,
+        health_check_interval=app_settings.REDIS_HEALTH_CHECK_INTERVAL,
+    )
+    return Redis(connection_pool=pool)
+
+
+redis_client = create_redis(app_settings.REDIS_URL)
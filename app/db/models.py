@@ -1,16 +1,33 @@
+from datetime import date
 from typing import Optional
 
 from sqlalchemy import Column, String, Integer, Date, Text, UniqueConstraint, ForeignKey, CheckConstraint, Boolean, \
-    DateTime, func
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+    DateTime, Index, SmallInteger, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 from .base import Base
 
 """SQLAlchemy ORM models for contacts and users."""
 
+
+def birthday_key(birthday: date | None) -> int | None:
+    """Return the month/day key (``month * 100 + day``) of a birthday."""
+    if birthday is None:
+        return None
+    return birthday.month * 100 + birthday.day
+
+
 class Contact(Base):
     """Contact entity representing an address book contact."""
     __tablename__ = "contacts"
-    __table_args__ = (UniqueConstraint("email", name="uq_contacts_email"),)
+    __table_args__ = (
+        UniqueConstraint("email", name="uq_contacts_email"),
+        # Keyset pagination: one (sort column, id) index per sortable column
+        Index("ix_contacts_first_name_id", "first_name", "id"),
+        Index("ix_contacts_last_name_id", "last_name", "id"),
+        Index("ix_contacts_email_id", "email", "id"),
+        Index("ix_contacts_birthday_id", "birthday", "id"),
+        Index("ix_contacts_birthday_key", "birthday_key"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     first_name: Mapped[str] = mapped_column(String(80))
@@ -18,9 +35,19 @@ class Contact(Base):
     email: Mapped[str] = mapped_column(String(255), unique=True)
     phone: Mapped[str] = mapped_column(String(32))
     birthday: Mapped[Date] = mapped_column(Date)
+    # Indexed month/day of `birthday`, kept in sync by `_set_birthday_key`
+    birthday_key: Mapped[int | None] = mapped_column(SmallInteger, nullable=True)
     extra: Mapped[str | None] = mapped_column(Text, nullable=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
     user: Mapped['User'] = relationship('User')
+    # Row version feeding the ETag, bumped by every UPDATE statement of the
+    # repository; not an optimistic lock, concurrent writes still last-write-win
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+
+    @validates("birthday")
+    def _set_birthday_key(self, key, value):
+        self.birthday_key = birthday_key(value)
+        return value
 
 class User(Base):
     """User entity representing an application user with roles and avatar."""
@@ -31,6 +58,8 @@ class User(Base):
     password: Mapped[str] = mapped_column(String(512), nullable=False)
     refresh_token: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     avatar: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # SHA-256 of the uploaded avatar image, to skip re-uploads of the same bytes
+    avatar_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
     confirmed = mapped_column(Boolean, default=False)
     created_at = mapped_column(DateTime, default=func.now())
     role: Mapped[str] = mapped_column(String(16), default="user")
@@ -0,0 +1,153 @@
+import asyncio
+import itertools
+import logging
+import time
+
+from sqlalchemy import Delete, Insert, Update, text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+"""Read-replica routing for database sessions.
+
+Statements opt in to replica reads with the ``read_replica`` execution
+option. A session sends them to the next healthy replica (round-robin) and
+everything else - writes, flushes and any read issued after the session
+has written - to the primary, so a request always reads its own writes.
+"""
+
+logger = logging.getLogger(__name__)
+
+READ_REPLICA = "read_replica"
+
+# Errors a replica read can fail with: driver errors, and refused or reset
+# connections that some drivers raise unwrapped. Only the connection
+# failures among them (see `replica_unavailable`) take a replica down.
+REPLICA_ERRORS = (DBAPIError, OSError)
+
+
+def replica_unavailable(err: BaseException) -> bool:
+    """Whether `err` means the connection failed, as opposed to the query.
+
+    A bad statement or parameter (``DataError``, ``ProgrammingError``, ...)
+    fails the same way on every server, so it is not a replica problem.
+    """
+    if isinstance(err, DBAPIError):
+        return err.connection_invalidated or isinstance(err, (OperationalError, InterfaceError))
+    return isinstance(err, OSError)
+
+
+class ReplicaSet:
+    """Round-robin pool of replica engines with simple health tracking."""
+
+    def __init__(self, engines: list[AsyncEngine], retry_after: float = 30) -> None:
+        self.engines = engines
+        self.retry_after = retry_after
+        self._down_until: dict[AsyncEngine, float] = {}
+        self._cycle = itertools.cycle(engines) if engines else None
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def is_healthy(self, engine: AsyncEngine) -> bool:
+        """Return True unless the engine failed within the last `retry_after` seconds."""
+        return self._down_until.get(engine, 0) <= time.monotonic()
+
+    def next(self) -> AsyncEngine | None:
+        """Return the next healthy replica or None if all of them are down."""
+        if self._cycle is None:
+            return None
+        for _ in range(len(self.engines)):
+            engine = next(self._cycle)
+            if self.is_healthy(engine):
+                return engine
+        return None
+
+    def mark_down(self, engine: AsyncEngine) -> None:
+        """Take a replica out of rotation for `retry_after` seconds."""
+        logger.warning("Read replica %s is unavailable, falling back", engine.url.render_as_string())
+        self._down_until[engine] = time.monotonic() + self.retry_after
+
+    def mark_up(self, engine: AsyncEngine) -> None:
+        self._down_until.pop(engine, None)
+
+    async def check(self) -> None:
+        """Ping every replica once, updating its health state."""
+        for engine in self.engines:
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            except REPLICA_ERRORS:
+                self.mark_down(engine)
+            else:
+                self.mark_up(engine)
+
+    async def run_health_checks(self, interval: float) -> None:
+        """Ping the replicas every `interval` seconds until cancelled."""
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+    async def dispose(self) -> None:
+        for engine in self.engines:
+            await engine.dispose()
+
+
+class RoutingSession(Session):
+    """Sync session that routes opted-in reads to replicas.
+
+    The replica set is taken from ``session.info["replicas"]``, which is
+    filled in by the session factory.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replicas: ReplicaSet | None = self.info.get("replicas")
+        self.info.pop("replica", None)
+
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.info["wrote"] = True
+        elif (
+            replicas
+            and not self.info.get("wrote")
+            and clause is not None
+            and clause.get_execution_options().get(READ_REPLICA)
+        ):
+            replica = replicas.next()
+            if replica is not None:
+                self.info["replica"] = replica
+                return replica.sync_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+class RoutingAsyncSession(AsyncSession):
+    """Async session that retries a replica read on the primary when the
+    replica cannot be reached. Any other error is raised unchanged."""
+
+    async def _replica_failed(self, err: BaseException) -> bool:
+        """Take the replica behind `err` out of rotation if it is unreachable.
+
+        Returns whether the statement should be retried on the primary.
+        """
+        replica = self.info.pop("replica", None)
+        if replica is None or not replica_unavailable(err):
+            return False
+        self.info["replicas"].mark_down(replica)
+        await self.rollback()
+        return True
+
+    async def execute(self, statement, *args, **kwargs):
+        try:
+            return await super().execute(statement, *args, **kwargs)
+        except REPLICA_ERRORS as err:
+            if not await self._replica_failed(err):
+                raise
+            return await super().execute(statement.execution_options(**{READ_REPLICA: False}), *args, **kwargs)
+
+    async def stream(self, statement, *args, **kwargs):
+        # Only opening the stream is retried; rows already sent cannot be
+        try:
+            return await super().stream(statement, *args, **kwargs)
+        except REPLICA_ERRORS as err:
+            if not await self._replica_failed(err):
+                raise
+            return await super().stream(statement.execution_options(**{READ_REPLICA: False}), *args, **kwargs)
@@ -0,0 +1,96 @@
+from sqlalchemy import DDL, event, func, literal_column, or_, table, column
+
+from .models import Contact
+
+"""Indexed full-text and fuzzy search over contact names and emails.
+
+PostgreSQL matches a ``tsvector`` expression index (whole words) plus
+``pg_trgm`` GIN indexes (substrings and typos) and ranks by ``ts_rank``
+and trigram similarity. SQLite uses an FTS5 trigram table kept in sync by
+triggers and ranks by ``bm25``. Both schemas are created with the
+``contacts`` table by ``create_all`` and by the Alembic migration.
+"""
+
+# Must stay identical to the expression of `ix_contacts_search_document`
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(first_name, '') || ' ' || "
+    "coalesce(last_name, '') || ' ' || coalesce(email, ''))"
+)
+
+# FTS5 trigram tokens need at least three characters to match anything
+MIN_FTS_TERM_LENGTH = 3
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_first_name_trgm ON contacts USING gin (first_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_last_name_trgm ON contacts USING gin (last_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_email_trgm ON contacts USING gin (email gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS ix_contacts_search_document ON contacts USING gin ({SEARCH_DOCUMENT})",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5("
+    "first_name, last_name, email, content='contacts', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+    "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+    "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+    "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+    "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+]
+
+for statement in POSTGRES_DDL:
+    event.listen(Contact.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_DDL:
+    event.listen(Contact.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Contact.__table__, "after_drop", DDL("DROP TABLE IF EXISTS contacts_fts").execute_if(dialect="sqlite"))
+
+contacts_fts = table("contacts_fts", column("rowid"), column("rank"))
+
+
+def _substring_match(term: str):
+    like = f"%{term}%"
+    return or_(
+        Contact.first_name.ilike(like),
+        Contact.last_name.ilike(like),
+        Contact.email.ilike(like),
+    )
+
+
+def apply_search(query, dialect: str, term: str):
+    """Restrict `query` to contacts matching `term`.
+
+    Returns the filtered query and an ascending ORDER BY expression that
+    sorts by relevance, best match first.
+    """
+    if dialect == "postgresql":
+        document = literal_column(SEARCH_DOCUMENT)
+        tsquery = func.websearch_to_tsquery(literal_column("'simple'"), term)
+        query = query.where(
+            or_(
+                document.op("@@")(tsquery),
+                _substring_match(term),
+                Contact.first_name.op("%")(term),
+                Contact.last_name.op("%")(term),
+            )
+        )
+        relevance = func.ts_rank(document, tsquery) + func.greatest(
+            func.similarity(Contact.first_name, term),
+            func.similarity(Contact.last_name, term),
+            func.similarity(Contact.email, term),
+        )
+        return query, relevance.desc()
+
+    if dialect == "sqlite" and len(term) >= MIN_FTS_TERM_LENGTH:
+        phrase = '"' + term.replace('"', '""') + '"'
+        query = query.join(contacts_fts, contacts_fts.c.rowid == Contact.id).where(
+            literal_column("contacts_fts").op("MATCH")(phrase)
+        )
+        return query, contacts_fts.c.rank
+
+    return query.where(_substring_match(term)), Contact.id
@@ -1,14 +1,43 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from starlette.middleware.cors import CORSMiddleware
+from starlette.staticfiles import StaticFiles
 
-from app.conf.config import app_settings
+from app.conf.config import app_settings, async_engine, replicas
+from app.conf.redis import redis_client
+from app.middleware.compression import CompressionMiddleware
+from app.services.email import mail_dispatcher
 from app.api.v1.contacts import router as contacts_router
 from app.api.v1.auth import router as auth_router
 from app.api.v1.users import router as users_router
-from slowapi.errors import RateLimitExceeded
+from app.api.v1.metrics import router as metrics_router
+from app.conf.limiter import RateLimitExceeded, RateLimitHeadersMiddleware
 from starlette.responses import JSONResponse
 
-app = FastAPI(title=app_settings.APP_NAME, version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start replica health checks and the mail dispatcher; flush mail and
+    release database, Redis and SMTP pools on shutdown."""
+    mail_dispatcher.start()
+    health_checks = None
+    if replicas:
+        health_checks = asyncio.create_task(
+            replicas.run_health_checks(app_settings.DATABASE_REPLICA_HEALTH_INTERVAL)
+        )
+    yield
+    if health_checks is not None:
+        health_checks.cancel()
+    await mail_dispatcher.stop()
+    await replicas.dispose()
+    await async_engine.dispose()
+    await redis_client.aclose(close_connection_pool=True)
+
+
+app = FastAPI(title=app_settings.APP_NAME, version="1.0.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -17,11 +46,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After"],
+)
+app.add_middleware(RateLimitHeadersMiddleware)
+app.add_middleware(
+    CompressionMiddleware,
+    levels=app_settings.COMPRESSION_LEVELS,
+    minimum_size=app_settings.COMPRESSION_MINIMUM_SIZE,
 )
 
 app.include_router(contacts_router, prefix="/api/v1")
 app.include_router(auth_router, prefix="/api/v1")
 app.include_router(users_router, prefix="/api/v1")
+app.include_router(metrics_router, prefix="/api/v1")
+
+if app_settings.STORAGE_BACKEND == "local":
+    os.makedirs(app_settings.LOCAL_STORAGE_PATH, exist_ok=True)
+    app.mount(app_settings.LOCAL_STORAGE_URL, StaticFiles(directory=app_settings.LOCAL_STORAGE_PATH), name="media")
 
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
@@ -0,0 +1,166 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+"""Response compression negotiated from ``Accept-Encoding``.
+
+Supports gzip always, plus brotli and zstd when their packages are
+installed. Only media types with a configured level are compressed, and
+complete bodies smaller than the threshold are sent as is. Streaming
+bodies are compressed chunk by chunk and flushed after every chunk, so
+clients still receive rows as soon as they are produced.
+"""
+
+# Preferred first when the client accepts several with the same q-value
+ENCODINGS = [name for name, available in (("br", brotli), ("zstd", zstandard), ("gzip", True)) if available]
+
+
+class Compressor:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, encoding: str, level: int) -> None:
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=level)
+        elif encoding == "zstd":
+            self._zstd = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        """Compress `data`; with `flush` the output decodes up to here."""
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.flush() if flush else b"")
+        if self.encoding == "zstd":
+            out = self._zstd.compress(data)
+            return out + self._zstd.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else out
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        if self.encoding == "zstd":
+            return self._zstd.flush()
+        return self._zlib.flush()
+
+
+def negotiate(accept_encoding: str, available: list[str] = ENCODINGS) -> str | None:
+    """Return the best of `available` allowed by an ``Accept-Encoding`` value."""
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in available:
+        q = weights.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses whose media type is in `levels`.
+
+    `levels` maps a media type to a 1-9 level, applied as the gzip level,
+    the brotli quality and the zstd level. Strong ETags are weakened on
+    compressed responses since the bytes differ from the identity ones.
+    """
+
+    def __init__(self, app: ASGIApp, levels: dict[str, int], minimum_size: int = 1024) -> None:
+        self.app = app
+        self.levels = levels
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await CompressionResponder(self, encoding, send)(scope, receive)
+
+
+class CompressionResponder:
+    """Per-request state: decides on the first body message whether to compress."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send) -> None:
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Message | None = None
+        self.compressor: Compressor | None = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    def level_for(self, headers: MutableHeaders) -> int | None:
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return self.middleware.levels.get(media_type)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=message["headers"])
+            if self.level_for(headers) is None or "content-encoding" in headers or message["status"] in (204, 304):
+                self.passthrough = True
+                await self.send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.compressor = Compressor(self.encoding, self.level_for(headers))
+            headers["Content-Encoding"] = self.encoding
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            if more_body:
+                del headers["content-length"]
+                await self.send(start)
+            else:
+                body = self.compressor.compress(body, flush=False) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+        if more_body:
+            chunk = self.compressor.compress(body) if body else b""
+        else:
+            chunk = self.compressor.compress(body, flush=False) + self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -1,35 +1,44 @@
 from fastapi import HTTPException, status
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import User
 from app.schemas.users import UserRegisterSchema
+from app.services.cache import cache_service
 
 class UserRepository:
-    """Repository for `User` entity operations using SQLAlchemy Session."""
-    async def get_user_by_email(self, email: str, db: Session):
-        """Return a user by email or None."""
-        return db.query(User).filter_by(email=email).first()
+    """Repository for `User` entity operations using SQLAlchemy AsyncSession.
 
-    async def get_user_refresh_token(self, email: str, refresh_token: str, db: Session):
+    Methods that change cached fields invalidate the user's auth cache
+    entry after committing.
+    """
+    async def get_user_by_email(self, email: str, db: AsyncSession, read_replica: bool = True):
+        """Return a user by email or None, from a replica unless `read_replica` is False."""
+        query = select(User).filter_by(email=email).execution_options(read_replica=read_replica)
+        result = await db.execute(query)
+        return result.scalars().first()
+
+    async def get_user_refresh_token(self, email: str, refresh_token: str, db: AsyncSession):
         """Return a user by email with matching refresh token or None."""
-        return db.query(User).filter_by(email=email, refresh_token=refresh_token).first()
+        result = await db.execute(select(User).filter_by(email=email, refresh_token=refresh_token))
+        return result.scalars().first()
 
-    async def create_user(self, body: UserRegisterSchema, db: Session):
+    async def create_user(self, body: UserRegisterSchema, db: AsyncSession):
         """Create a new user, ensuring unique email. Raises HTTP 400 on conflict."""
-        new_user = User(**body.model_dump())
+        new_user = User(**body.model_dump(exclude={"id"}))
         db.add(new_user)
         try:
-            db.commit()
-            db.refresh(new_user)
+            await db.commit()
+            await db.refresh(new_user)
             return new_user
         except IntegrityError:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User with this email already exists"
             )
 
-    async def confirm_email(self, email: str, db: Session):
+    async def confirm_email(self, email: str, db: AsyncSession):
         """Mark user's email as confirmed. Raises 404 if user not found."""
         user = await self.get_user_by_email(email, db)
 
@@ -37,15 +46,33 @@ class UserRepository:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
         user.confirmed = True
-        db.commit()
+        await db.commit()
+        await cache_service.invalidate_user(user.id)
+
+    async def get_avatar_hash(self, user_id: int, db: AsyncSession) -> str | None:
+        """Return the content hash of the user's current avatar, if any.
 
-    async def update_avatar_url(self, email: str, avatar_url: str, db: Session):
-        """Update user's avatar URL and return updated user."""
+        Read from the primary, so a lagging replica cannot make a changed
+        avatar look unchanged.
+        """
+        result = await db.execute(select(User.avatar_hash).filter_by(id=user_id))
+        return result.scalar()
+
+    async def update_avatar_url(self, email: str, avatar_url: str, db: AsyncSession, avatar_hash: str | None = None):
+        """Update user's avatar URL (and its content hash) and return updated user."""
         user = await self.get_user_by_email(email, db)
         user.avatar = avatar_url
-        db.commit()
-        db.refresh(user)
+        user.avatar_hash = avatar_hash
+        await db.commit()
+        await db.refresh(user)
+        await cache_service.invalidate_user(user.id)
         return user
 
+    async def update_password(self, user: User, hashed_password: str, db: AsyncSession):
+        """Store a new password hash for `user` and drop its cached copy."""
+        user.password = hashed_password
+        await db.commit()
+        await cache_service.invalidate_user(user.id)
+
 
 auth_repository = UserRepository()
\ No newline at end of file
@@ -1,23 +1,104 @@
+import base64
+import calendar
+import binascii
+import json
+
+from typing import AsyncIterator, Literal
+
 from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
-from sqlalchemy.sql import select, or_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import select, update, delete, case, or_, tuple_
 from datetime import date, timedelta
 
 from starlette import status
 
-from ..db.models import Contact
-from ..schemas.contacts import ContactCreate, ContactUpdate
+from ..db.models import Contact, birthday_key
+from ..db.search import apply_search
+from ..schemas.contacts import ContactCreate, ContactUpdate, ContactFilters
+from ..services.contacts_cache import contacts_cache
 
 """
 Contacts repository provides CRUD operations and business queries
-for `Contact` entities using a synchronous SQLAlchemy ORM `Session`.
+for `Contact` entities using an async SQLAlchemy ORM `AsyncSession`.
 """
 
+# Columns clients may sort (and page by cursor) on; `id` breaks ties
+SORT_COLUMNS = {
+    "id": Contact.id,
+    "first_name": Contact.first_name,
+    "last_name": Contact.last_name,
+    "email": Contact.email,
+    "birthday": Contact.birthday,
+}
+
+
+# Columns of `ContactRead`, in its field order, for projected reads
+READ_COLUMNS = [
+    Contact.first_name,
+    Contact.last_name,
+    Contact.email,
+    Contact.phone,
+    Contact.birthday,
+    Contact.extra,
+    Contact.user_id,
+    Contact.id,
+]
+
+# Dialect-specific INSERT constructs supporting ON CONFLICT
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# Bound parameters per statement: asyncpg allows 32767, SQLite 32766
+MAX_BIND_PARAMETERS = 32766
+
+
+def encode_cursor(sort: str, contact: Contact) -> str:
+    """Encode the position after `contact` in `sort` order as an opaque cursor."""
+    value = getattr(contact, sort)
+    if isinstance(value, date):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, contact.id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """Decode a cursor into the ``(sort value, id)`` it points after.
+
+    Raises an HTTP 400 if the cursor is malformed, was issued for a
+    different sort column or holds a value of the wrong type for it.
+    """
+    invalid = HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, last_id = json.loads(raw)
+        if sort == "birthday":
+            value = date.fromisoformat(value)
+    except (binascii.Error, ValueError, TypeError):
+        raise invalid
+    if cursor_sort != sort or not _is_int(last_id):
+        raise invalid
+    # Values of the wrong type would fail in the database instead
+    if not (_is_int(value) if sort == "id" else isinstance(value, (str, date))):
+        raise invalid
+    return value, last_id
+
+
 class ContactsRepository:
-    """Repository for `Contact` entity operations."""
+    """Repository for `Contact` entity operations.
+
+    Methods that change contacts invalidate the contacts read cache after
+    committing.
+    """
 
-    def create_contact(self, db: Session, contact: ContactCreate) -> Contact:
+    async def create_contact(self, db: AsyncSession, contact: ContactCreate) -> Contact:
         """Create a new contact.
 
         Raises an HTTP 400 if email already exists.
@@ -25,88 +106,320 @@ class ContactsRepository:
         new_contact = Contact(**contact.model_dump())
         db.add(new_contact)
         try:
-            db.commit()
-            db.refresh(new_contact)
+            await db.commit()
+            await db.refresh(new_contact)
+            await contacts_cache.invalidate()
             return new_contact
         except IntegrityError:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Contact with this email already exists"
             )
 
-    def get_contact(self, db: Session, contact_id: int):
+    async def upsert_contacts(
+        self,
+        db: AsyncSession,
+        contacts: list[ContactCreate],
+        on_conflict: Literal["skip", "update"] = "skip",
+    ) -> int:
+        """Insert `contacts` with ``INSERT ... ON CONFLICT (email)``.
+
+        Existing emails are left alone (``skip``) or overwritten
+        (``update``). Emails must be unique within `contacts`. Batches too
+        large for one statement's bound parameters are split into several
+        statements in the same transaction. Returns the number of rows
+        written; other database errors roll back the batch and propagate
+        as `IntegrityError`.
+        """
+        if not contacts:
+            return 0
+        # Core inserts bypass the ORM validator that fills birthday_key
+        rows = [{**contact.model_dump(), "birthday_key": birthday_key(contact.birthday)} for contact in contacts]
+        insert = UPSERT_INSERTS[db.get_bind().dialect.name]
+        # One parameter per column and row, plus the version increment
+        chunk_size = (MAX_BIND_PARAMETERS - 1) // len(rows[0])
+        written = 0
+        try:
+            for start in range(0, len(rows), chunk_size):
+                stmt = insert(Contact).values(rows[start:start + chunk_size])
+                if on_conflict == "update":
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[Contact.email],
+                        set_={
+                            **{name: stmt.excluded[name] for name in rows[0] if name != "email"},
+                            "version": Contact.version + 1,
+                        },
+                    )
+                else:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=[Contact.email])
+                result = await db.execute(stmt.returning(Contact.id))
+                written += len(result.all())
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise
+        await contacts_cache.invalidate()
+        return written
+
+    async def get_contact(self, db: AsyncSession, contact_id: int):
         """Return contact by id or None."""
-        return db.get(Contact, contact_id)
+        query = select(Contact).where(Contact.id == contact_id).execution_options(read_replica=True)
+        result = await db.execute(query)
+        return result.scalars().first()
 
-    def list_contacts(
+    async def list_contacts(
         self,
-        db: Session,
+        db: AsyncSession,
         search: str | None = None,
         first_name: str | None = None,
         last_name: str | None = None,
         email: str | None = None,
         skip: int = 0,
-        limit: int = 100
-    ) -> list[Contact]:
-        """List contacts with optional text filters and pagination."""
+        limit: int = 100,
+        cursor: str | None = None,
+        sort: str | None = None,
+        columns: list | None = None,
+    ) -> list:
+        """List contacts with optional text filters and pagination.
+
+        `search` runs an indexed full-text/fuzzy match (see `app.db.search`)
+        and, unless another `sort` is requested, orders by relevance. Other
+        results are ordered by ``(sort, id)``; when `cursor` is given the page
+        starts right after the position it encodes (keyset pagination) and
+        `skip` is ignored, so deep pages cost the same as the first one.
+
+        Returns `Contact` entities, or rows of just `columns` when given
+        (e.g. `READ_COLUMNS`), which skips ORM hydration entirely.
+        """
+        sort = self.resolve_sort(search, sort)
+        query, relevance = self.filter_contacts(db, search, first_name, last_name, email)
+        if columns:
+            query = query.with_only_columns(*columns)
+
+        if sort == "relevance":
+            if cursor:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cursor pagination requires a sort column other than relevance"
+                )
+            query = query.order_by(relevance, Contact.id).offset(skip)
+        else:
+            sort_column = SORT_COLUMNS[sort]
+            if cursor:
+                value, last_id = decode_cursor(cursor, sort)
+                if sort == "id":
+                    query = query.where(Contact.id > last_id)
+                else:
+                    query = query.where(tuple_(sort_column, Contact.id) > tuple_(value, last_id))
+            else:
+                query = query.offset(skip)
+            if sort == "id":
+                query = query.order_by(Contact.id)
+            else:
+                query = query.order_by(sort_column, Contact.id)
+        query = query.limit(limit).execution_options(read_replica=True)
+        result = await db.execute(query)
+        return result.all() if columns else result.scalars().all()
+
+    def filter_contacts(
+        self,
+        db: AsyncSession,
+        search: str | None = None,
+        first_name: str | None = None,
+        last_name: str | None = None,
+        email: str | None = None,
+    ):
+        """Return an unordered ``select(Contact)`` restricted by the list
+        filters, and the relevance ORDER BY expression when searching."""
         query = select(Contact)
+        relevance = None
         if search:
-            like = f"%{search}%"
-            query = query.where(
-                or_(
-                    Contact.first_name.ilike(like),
-                    Contact.last_name.ilike(like),
-                    Contact.email.ilike(like),
-                )
-            )
+            query, relevance = apply_search(query, db.get_bind().dialect.name, search)
         if first_name:
             query = query.where(Contact.first_name.ilike(f"%{first_name}%"))
         if last_name:
             query = query.where(Contact.last_name.ilike(f"%{last_name}%"))
         if email:
             query = query.where(Contact.email.ilike(f"%{email}%"))
-        query = query.offset(skip).limit(limit)
-        return db.execute(query).scalars().all()
+        return query, relevance
+
+    async def stream_contacts(
+        self,
+        db: AsyncSession,
+        columns: list,
+        search: str | None = None,
+        first_name: str | None = None,
+        last_name: str | None = None,
+        email: str | None = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[list]:
+        """Yield every contact matching the list filters, in id order, as
+        batches of `columns` rows.
+
+        Rows come from a server-side cursor `batch_size` at a time, so
+        memory stays flat however many contacts match.
+        """
+        query, _ = self.filter_contacts(db, search, first_name, last_name, email)
+        query = (
+            query.with_only_columns(*columns)
+            .order_by(Contact.id)
+            .execution_options(yield_per=batch_size, read_replica=True)
+        )
+        result = await db.stream(query)
+        async for partition in result.partitions():
+            yield partition
+
+    @staticmethod
+    def resolve_sort(search: str | None, sort: str | None) -> str:
+        """Return the effective sort: relevance for searches, id otherwise."""
+        if sort is None or (sort == "relevance" and not search):
+            return "relevance" if search else "id"
+        return sort
+
+    def next_cursor(self, contacts: list, sort: str, limit: int) -> str | None:
+        """Return the cursor of the page after `contacts` (entities or rows
+        with the sort column and id), or None on the last page or when
+        results are ordered by relevance."""
+        if sort == "relevance" or not contacts or len(contacts) < limit:
+            return None
+        return encode_cursor(sort, contacts[-1])
 
-    def update_contact(self, db: Session, contact_id: int, data: ContactUpdate) -> Contact | None:
+    async def update_contact(self, db: AsyncSession, contact_id: int, data: ContactUpdate) -> Contact | None:
         """Update a contact by id returning the updated entity or None if not found."""
-        obj = db.get(Contact, contact_id)
+        obj = await db.get(Contact, contact_id)
         if not obj:
             return None
-        for k, v in data.model_dump(exclude_unset=True).items():
+        changes = data.model_dump(exclude_unset=True)
+        if not changes:
+            return obj
+        for k, v in changes.items():
             setattr(obj, k, v)
-        db.commit()
-        db.refresh(obj)
+        obj.version = Contact.version + 1
+        await db.commit()
+        await db.refresh(obj)
+        await contacts_cache.invalidate()
         return obj
 
-    def delete_contact(self, db: Session, contact_id: int) -> bool:
+    async def delete_contact(self, db: AsyncSession, contact_id: int) -> bool:
         """Delete a contact by id, returning True if deleted, False if not found."""
-        obj = db.get(Contact, contact_id)
+        obj = await db.get(Contact, contact_id)
         if not obj:
             return False
-        db.delete(obj)
-        db.commit()
+        await db.delete(obj)
+        await db.commit()
+        await contacts_cache.invalidate()
         return True
 
-    def birthdays_next_7_days(self, db: Session) -> list[Contact]:
-        """Return contacts with birthdays within the next 7 days.
+    def bulk_condition(self, db: AsyncSession, ids: list[int] | None, filters: ContactFilters | None):
+        """Return the WHERE clause selecting contacts by `ids` or `filters`.
 
-        Handles year wrap-around using day-of-year computations.
+        Filters become an id subquery, since search may join the SQLite
+        full-text table, which UPDATE and DELETE cannot.
         """
-        today = date.today()
-        end = today + timedelta(days=7)
+        if ids is not None:
+            return Contact.id.in_(ids)
+        query, _ = self.filter_contacts(db, filters.search, filters.first_name, filters.last_name, filters.email)
+        return Contact.id.in_(query.with_only_columns(Contact.id))
 
-        doy = func.extract("doy", Contact.birthday)
-        t_doy = func.extract("doy", func.make_date(2000, today.month, today.day))
-        e_doy = func.extract("doy", func.make_date(2000, end.month, end.day))
+    async def bulk_update_contacts(
+        self,
+        db: AsyncSession,
+        data: ContactUpdate,
+        ids: list[int] | None = None,
+        filters: ContactFilters | None = None,
+    ) -> list[int]:
+        """Apply the fields set in `data` to every selected contact with one
+        ``UPDATE ... RETURNING`` statement; returns the updated ids.
+
+        Raises an HTTP 400 if the change would duplicate an email.
+        """
+        values = data.model_dump(exclude_unset=True)
+        if "birthday" in values:
+            values["birthday_key"] = birthday_key(values["birthday"])
+        values["version"] = Contact.version + 1
+        stmt = (
+            update(Contact)
+            .where(self.bulk_condition(db, ids, filters))
+            .values(**values)
+            .returning(Contact.id)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            result = await db.execute(stmt)
+            updated = list(result.scalars().all())
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Contact with this email already exists"
+            )
+        if updated:
+            await contacts_cache.invalidate()
+        return updated
+
+    async def bulk_delete_contacts(
+        self,
+        db: AsyncSession,
+        ids: list[int] | None = None,
+        filters: ContactFilters | None = None,
+    ) -> list[int]:
+        """Delete every selected contact with one ``DELETE ... RETURNING``
+        statement; returns the deleted ids."""
+        stmt = (
+            delete(Contact)
+            .where(self.bulk_condition(db, ids, filters))
+            .returning(Contact.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        deleted = list(result.scalars().all())
+        await db.commit()
+        if deleted:
+            await contacts_cache.invalidate()
+        return deleted
+
+    async def upcoming_birthdays(
+        self,
+        db: AsyncSession,
+        days: int = 7,
+        today: date | None = None,
+        columns: list | None = None,
+    ) -> list:
+        """Return contacts with birthdays from `today` through `today + days`.
+
+        Matches on the indexed ``birthday_key`` (month * 100 + day), so the
+        query is an index range scan on every backend. Windows that cross
+        New Year become two ranges, and Feb 29 birthdays are celebrated on
+        Feb 28 in non-leap years. Results are ordered by upcoming date.
+        As with `list_contacts`, `columns` selects rows instead of entities.
+        """
+        today = today or date.today()
+        end = today + timedelta(days=days)
+        start_key = birthday_key(today)
+        end_key = birthday_key(end)
+        if end.month == 2 and end.day == 28 and not calendar.isleap(end.year):
+            end_key = 229
 
-        if end.year == today.year:
-            cond = (doy >= t_doy) & (doy <= e_doy)
+        if days >= 365 or start_key == end_key:
+            cond = Contact.birthday_key.is_not(None)
+        elif start_key < end_key:
+            cond = Contact.birthday_key.between(start_key, end_key)
         else:
-            cond = (doy >= t_doy) | (doy <= e_doy)
+            cond = or_(Contact.birthday_key >= start_key, Contact.birthday_key <= end_key)
 
-        return db.execute(select(Contact).where(Contact.birthday.is_not(None), cond)).scalars().all()
+        query = (
+            select(*columns or [Contact])
+            .where(cond)
+            .order_by(case((Contact.birthday_key >= start_key, 0), else_=1), Contact.birthday_key, Contact.id)
+            .execution_options(read_replica=True)
+        )
+        result = await db.execute(query)
+        return result.all() if columns else result.scalars().all()
 
+    async def birthdays_next_7_days(self, db: AsyncSession) -> list[Contact]:
+        """Return contacts with birthdays within the next 7 days."""
+        return await self.upcoming_birthdays(db, 7)
 
 contacts_repository = ContactsRepository()
\ No newline at end of file
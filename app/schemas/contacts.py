@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from datetime import date
 
 class ContactBase(BaseModel):
@@ -25,4 +25,60 @@ class ContactUpdate(ContactBase):
 class ContactRead(ContactBase):
     id: int
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ContactImportError(BaseModel):
+    line: int
+    error: str
+
+class ContactImportReport(BaseModel):
+    rows: int
+    written: int
+    skipped: int
+    failed: int
+    errors: list[ContactImportError]
+
+
+class ContactFilters(BaseModel):
+    """Same filters as the list endpoint; at least one must be given."""
+    search: str | None = None
+    first_name: str | None = None
+    last_name: str | None = None
+    email: str | None = None
+
+    @model_validator(mode="after")
+    def _require_one(self):
+        if not any((self.search, self.first_name, self.last_name, self.email)):
+            raise ValueError("at least one filter is required")
+        return self
+
+class ContactBulkSelection(BaseModel):
+    """Selects contacts either by id or by filters, never both."""
+    ids: list[int] | None = Field(default=None, min_length=1, max_length=10000)
+    filters: ContactFilters | None = None
+
+    @model_validator(mode="after")
+    def _require_selector(self):
+        if (self.ids is None) == (self.filters is None):
+            raise ValueError("give exactly one of ids or filters")
+        return self
+
+class ContactBulkUpdate(ContactBulkSelection):
+    changes: ContactUpdate
+
+    @model_validator(mode="after")
+    def _require_changes(self):
+        if not self.changes.model_fields_set:
+            raise ValueError("changes must set at least one field")
+        # Only `extra` is nullable; other explicit nulls would fail in the database
+        nulls = sorted(
+            name for name in self.changes.model_fields_set
+            if name != "extra" and getattr(self.changes, name) is None
+        )
+        if nulls:
+            raise ValueError(f"changes cannot set {', '.join(nulls)} to null")
+        return self
+
+class ContactBulkResult(BaseModel):
+    affected: int
+    ids: list[int]
@@ -3,13 +3,14 @@ from typing import Optional, Literal
 from fastapi import HTTPException, status
 from fastapi.params import Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from jose import jwt, JWTError
 from ..conf.config import app_settings, get_db
 from datetime import datetime, timedelta, timezone
 from ..repositories.auth import auth_repository
-from sqlalchemy.orm import Session
-from .cache import cache_service
+from sqlalchemy.ext.asyncio import AsyncSession
+from .cache import CachedUser, cache_service
+from .metrics import metrics
+from .password_hasher import PasswordHasherPool, create_password_context
 
 """
 Authentication service handles password hashing/verification, JWT creation and
@@ -20,14 +21,29 @@ REFRESH_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 
 class AuthService:
-    pwd_context = CryptContext(schemes=["bcrypt"])
+    pwd_context = create_password_context(
+        app_settings.PASSWORD_HASH_SCHEME,
+        bcrypt_rounds=app_settings.BCRYPT_ROUNDS,
+        argon2_time_cost=app_settings.ARGON2_TIME_COST,
+        argon2_memory_cost=app_settings.ARGON2_MEMORY_COST,
+        argon2_parallelism=app_settings.ARGON2_PARALLELISM,
+    )
     oauth2_schema = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+    hasher = PasswordHasherPool(app_settings.PASSWORD_HASH_WORKERS, app_settings.PASSWORD_HASH_MAX_QUEUE)
 
-    def verify_password(self, plain_password: str, hashed_password: str):
-        return self.pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str):
+        return await self.hasher.run(self.pwd_context.verify, plain_password, hashed_password)
 
-    def hash_password(self, password: str):
-        return self.pwd_context.hash(password)
+    async def verify_and_update_password(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """Verify a password and return ``(valid, new_hash)``.
+
+        `new_hash` is set when the stored hash uses an outdated scheme or
+        cost and should replace it.
+        """
+        return await self.hasher.run(self.pwd_context.verify_and_update, plain_password, hashed_password)
+
+    async def hash_password(self, password: str):
+        return await self.hasher.run(self.pwd_context.hash, password)
 
     async def create_token(self, payload: dict, expires_delta: timedelta | float, token_type: Optional[Literal["access", "refresh", "reset"]]):
         to_encode = payload.copy()
@@ -63,7 +79,19 @@ class AuthService:
     async def create_reset_token(self, payload: dict, expires_minutes: int = 30):
         return await self.create_token(payload, timedelta(minutes=expires_minutes), "reset")
 
-    async def get_current_user(self, token: str = Depends(oauth2_schema), db: Session = Depends(get_db)):
+    async def get_current_user(self, token: str = Depends(oauth2_schema), db: AsyncSession = Depends(get_db)):
+        """Resolve the user of an access token.
+
+        Lookups go through three tiers: an in-process cache of verified
+        tokens (L1, skips JWT decoding), Redis (L2) and the database (L3).
+        L1 entries never outlive the token's ``exp``.
+        """
+        user = cache_service.local.get(token)
+        if user is not None:
+            metrics.incr("auth_cache_l1_hits")
+            return user
+        metrics.incr("auth_cache_l1_misses")
+
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -83,17 +111,24 @@ class AuthService:
         # Try cache by token first
         cached_user = await cache_service.get_user_by_token(token)
         if cached_user:
+            metrics.incr("auth_cache_l2_hits")
+            cache_service.local.set(token, cached_user, payload.get("exp"))
             return cached_user
+        metrics.incr("auth_cache_l2_misses")
 
-        user = await auth_repository.get_user_by_email(email, db)
+        # From the primary: a lagging replica would refill the cache with a
+        # user as it was before a change that was just invalidated
+        since = await cache_service.read_stamp()
+        user = await auth_repository.get_user_by_email(email, db, read_replica=False)
         if user is None:
             raise credentials_exception
 
-        # Cache user for the duration of access token
-        await cache_service.set_user_for_token(token, user)
+        # Cache user for the duration of access token, unless it changed meanwhile
+        if await cache_service.set_user_for_token(token, user, since):
+            cache_service.local.set(token, CachedUser.from_user(user), payload.get("exp"))
         return user
 
-    def verify_refresh_token(self, refresh_token: str, db: Session):
+    async def verify_refresh_token(self, refresh_token: str, db: AsyncSession):
         try:
             payload = jwt.decode(refresh_token, app_settings.SECRET_KEY)
             username: str = payload.get("sub")
@@ -102,7 +137,7 @@ class AuthService:
             if username is None or token_type != "refresh":
                 return None
 
-            user = auth_repository.get_user_refresh_token(username, refresh_token, db)
+            user = await auth_repository.get_user_refresh_token(username, refresh_token, db)
 
             return user
         except JWTError:
@@ -1,40 +1,264 @@
+import logging
+from collections import OrderedDict
 from typing import Optional
-import json
+import time
+import orjson
 from redis.asyncio import Redis
+from redis.exceptions import RedisError
 from ..conf.config import app_settings
+from ..conf.redis import redis_client
+from .metrics import metrics
 
 """Redis-backed caching utilities for authenticated user data."""
 
+logger = logging.getLogger(__name__)
+
+
+# Leading byte of every cached user entry; bump it when the layout changes
+USER_FORMAT_VERSION = 1
+
+
+class CachedUser:
+    """Read-only snapshot of a user as kept in the auth caches.
+
+    Stored in Redis as a version byte followed by an orjson array of the
+    slot values, so entries carry no field names and decoding builds no
+    new classes.
+    """
+    __slots__ = ("id", "email", "username", "avatar", "role", "confirmed")
+
+    def __init__(self, id: int, email: str, username: str, avatar: str | None, role: str | None, confirmed: bool) -> None:
+        self.id = id
+        self.email = email
+        self.username = username
+        self.avatar = avatar
+        self.role = role
+        self.confirmed = confirmed
+
+    @classmethod
+    def from_user(cls, user) -> "CachedUser":
+        """Return a detached copy of `user` safe to keep across requests."""
+        return cls(
+            user.id,
+            user.email,
+            user.username,
+            user.avatar,
+            getattr(user, "role", "user"),
+            bool(user.confirmed),
+        )
+
+    def encode(self) -> bytes:
+        """Serialize to the versioned binary cache format."""
+        return bytes((USER_FORMAT_VERSION,)) + orjson.dumps(
+            [self.id, self.email, self.username, self.avatar, self.role, self.confirmed]
+        )
+
+    @classmethod
+    def decode(cls, raw: bytes) -> Optional["CachedUser"]:
+        """Deserialize an entry, returning None for unknown or legacy formats."""
+        if not raw or raw[0] != USER_FORMAT_VERSION:
+            return None
+        return cls(*orjson.loads(raw[1:]))
+
+
+class LocalTTLCache:
+    """Bounded in-process LRU cache with a deadline per entry.
+
+    Entries expire at the deadline given to `set` or after `ttl` seconds,
+    whichever comes first; the least recently used entry is evicted once
+    `maxsize` is reached. Not shared between worker processes.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[object, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str):
+        """Return the value stored under `key`, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, expires_at: float | None = None) -> None:
+        """Store `value` until `expires_at` (epoch seconds), capped by `ttl`."""
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        self._entries[key] = (value, deadline)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def discard_where(self, predicate) -> None:
+        """Remove every entry whose value matches `predicate`."""
+        for key in [key for key, (value, _) in self._entries.items() if predicate(value)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Atomic get-and-delete of a single key
+POP_SCRIPT = """
+local val = redis.call('GET', KEYS[1])
+if val then
+    redis.call('DEL', KEYS[1])
+end
+return val
+"""
+
+# Resolve token -> user id -> user payload in one round trip.
+# KEYS[1] is the token index key, ARGV[1] the user key prefix.
+USER_BY_TOKEN_SCRIPT = """
+local user_id = redis.call('GET', KEYS[1])
+if not user_id then
+    return nil
+end
+return redis.call('GET', ARGV[1] .. user_id)
+"""
+
+# Drop a cached user and leave a tombstone holding the server time in
+# microseconds. KEYS[1] is the user key, KEYS[2] the tombstone key and
+# ARGV[1] the tombstone TTL.
+INVALIDATE_USER_SCRIPT = """
+local now = redis.call('TIME')
+redis.call('SET', KEYS[2], now[1] .. string.format('%06d', now[2]), 'EX', ARGV[1])
+return redis.call('DEL', KEYS[1])
+"""
+
+# Cache a user unless it was invalidated at or after ARGV[3], the stamp taken
+# before the user was read ('' to store unconditionally). KEYS as above,
+# ARGV[1] is the TTL and ARGV[2] the payload.
+FILL_USER_SCRIPT = """
+local invalidated = redis.call('GET', KEYS[2])
+if invalidated and ARGV[3] ~= '' and tonumber(invalidated) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('SETEX', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+
+
 class CacheService:
-    """Cache service for storing and retrieving current user by access token."""
-    def __init__(self) -> None:
-        self.client: Redis = Redis.from_url(app_settings.REDIS_URL, decode_responses=True)
+    """Cache service for storing and retrieving current user by access token.
+
+    Users are cached once, under their id; each access token only maps to
+    that id. Invalidating a user is therefore a single key delete, and a
+    user's Redis footprint is one payload plus one small index entry per
+    live token. A process-local L1 cache (`local`) sits in front of it.
+
+    Invalidation leaves a short-lived tombstone, so a fill that read the
+    user before the change cannot store it after the delete.
+    """
+    def __init__(self, client: Redis | None = None) -> None:
+        # Raw bytes: user entries are binary, string values are decoded explicitly
+        self.client: Redis = client or redis_client
         self.prefix = "auth:user:token:"
         self.ttl_seconds = 15 * 60
+        self.user_prefix = "auth:user:id:"
+        self.user_ttl_seconds = app_settings.AUTH_USER_CACHE_TTL
+        # Outlives any database read a fill could still be waiting on
+        self.tombstone_prefix = "auth:user:invalidated:"
+        self.tombstone_ttl_seconds = 60
+        # Verified access token -> CachedUser, per worker process
+        self.local = LocalTTLCache(app_settings.AUTH_L1_CACHE_SIZE, app_settings.AUTH_L1_CACHE_TTL)
         # Password reset token storage (single-use)
         self.reset_prefix = "auth:reset:token:"
         self.reset_ttl_seconds = 30 * 60
+        # Get-and-delete in one round trip; sent by SHA after the first call
+        self._pop_script = self.client.register_script(POP_SCRIPT)
+        self._user_by_token_script = self.client.register_script(USER_BY_TOKEN_SCRIPT)
+        self._invalidate_user_script = self.client.register_script(INVALIDATE_USER_SCRIPT)
+        self._fill_user_script = self.client.register_script(FILL_USER_SCRIPT)
+
+    async def read_stamp(self) -> int:
+        """Redis server time in microseconds.
+
+        Take it before reading a user from the database and pass it to
+        `set_user_for_token`, which then skips users invalidated since.
+        """
+        seconds, microseconds = await self.client.time()
+        return seconds * 1_000_000 + microseconds
+
+    async def set_user_for_token(self, token: str, user, since: int | None = None) -> bool:
+        """Cache the user and index the access token to it, pipelined.
+
+        Returns False if the user was not stored because it changed after
+        `since` (see `read_stamp`).
+        """
+        return (await self.set_users_for_tokens([(token, user)], since))[0]
 
-    async def set_user_for_token(self, token: str, user) -> None:
-        """Cache minimal user payload under the given access token."""
-        data = {
-            "id": user.id,
-            "email": user.email,
-            "username": user.username,
-            "avatar": user.avatar,
-            "role": getattr(user, "role", "user"),
-            "confirmed": bool(user.confirmed),
-        }
-        await self.client.setex(self.prefix + token, self.ttl_seconds, json.dumps(data))
-
-    async def get_user_by_token(self, token: str) -> Optional[object]:
+    async def get_user_by_token(self, token: str) -> Optional[CachedUser]:
         """Retrieve cached user by access token or None if missing/expired."""
-        raw = await self.client.get(self.prefix + token)
+        raw = await self._user_by_token_script(keys=[self.prefix + token], args=[self.user_prefix])
         if not raw:
             return None
-        data = json.loads(raw)
-        # Return a simple object with attributes to mimic ORM user for read-only usage
-        return type("CachedUser", (), data)
+        return CachedUser.decode(raw)
+
+    async def set_users_for_tokens(self, items: list[tuple[str, object]], since: int | None = None) -> list[bool]:
+        """Cache several ``(token, user)`` pairs in a single pipelined round trip.
+
+        Users invalidated at or after `since` are not stored; returns
+        whether each one was.
+        """
+        if not items:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for token, user in items:
+                cached = CachedUser.from_user(user)
+                await self._fill_user_script(
+                    keys=[self.user_prefix + str(cached.id), self.tombstone_prefix + str(cached.id)],
+                    args=[self.user_ttl_seconds, cached.encode(), "" if since is None else since],
+                    client=pipe,
+                )
+                pipe.setex(self.prefix + token, self.ttl_seconds, cached.id)
+            results = await pipe.execute()
+        return [bool(stored) for stored in results[::2]]
+
+    async def get_users_by_tokens(self, tokens: list[str]) -> list[Optional[CachedUser]]:
+        """Fetch the cached users of several tokens with two MGETs.
+
+        The result is aligned with `tokens`; missing entries are None.
+        """
+        if not tokens:
+            return []
+        user_ids = await self.client.mget([self.prefix + token for token in tokens])
+        wanted = sorted({user_id for user_id in user_ids if user_id})
+        if not wanted:
+            return [None] * len(tokens)
+        raws = await self.client.mget([self.user_prefix.encode() + user_id for user_id in wanted])
+        users = {user_id: CachedUser.decode(raw) for user_id, raw in zip(wanted, raws) if raw}
+        return [users.get(user_id) for user_id in user_ids]
+
+    async def invalidate_user(self, user_id: int) -> None:
+        """Drop the cached copy of a user after it changed.
+
+        Token index entries stay and will miss until the next request
+        repopulates the user from the database. Other workers' L1 caches
+        converge within `AUTH_L1_CACHE_TTL` seconds.
+
+        Called after the change is committed, so Redis failures are logged
+        and counted as ``auth_cache_errors`` instead of failing the request.
+        """
+        self.local.discard_where(lambda cached: cached.id == user_id)
+        try:
+            await self._invalidate_user_script(
+                keys=[self.user_prefix + str(user_id), self.tombstone_prefix + str(user_id)],
+                args=[self.tombstone_ttl_seconds],
+            )
+        except RedisError:
+            logger.warning("Could not invalidate cached user %s", user_id, exc_info=True)
+            metrics.incr("auth_cache_errors")
 
     async def set_password_reset_token(self, token: str, email: str) -> None:
         """Store a single-use password reset token mapped to user's email.
@@ -49,21 +273,13 @@ class CacheService:
         Returns None if the token is missing or expired. This enforces single-use tokens.
         """
         key = self.reset_prefix + token
-        # Use a Lua script to get-and-delete atomically
-        script = """
-        local val = redis.call('GET', KEYS[1])
-        if val then
-            redis.call('DEL', KEYS[1])
-        end
-        return val
-        """
         try:
-            email = await self.client.eval(script, 1, key)
+            email = await self._pop_script(keys=[key])
         except Exception:
             # Fallback if EVAL is disabled: best-effort get/del
             email = await self.client.get(key)
             if email:
                 await self.client.delete(key)
-        return email
+        return email.decode() if email else None
 
 cache_service = CacheService() 
\ No newline at end of file
@@ -0,0 +1,140 @@
+import hashlib
+import logging
+from typing import Awaitable, Callable
+
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from ..conf.config import app_settings
+from ..conf.redis import redis_client
+from .etag import etag_matches, make_etag
+from .metrics import metrics
+
+"""Versioned read-through cache for contact reads.
+
+Rendered JSON responses of single contacts, list/search pages and the
+upcoming-birthdays view are cached in Redis under keys that embed a
+collection version counter. Every write bumps the counter, which makes
+all older entries unreachable at once; they simply expire by TTL.
+
+Conditional requests are answered from the stored entry's own content
+ETag, never from the counter alone: if a version bump is lost to a Redis
+error, clients still see the change once the entry expires.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Read the current version and the entry stored under it in one round trip.
+# KEYS[1] is the version key, ARGV[1]/ARGV[2] the entry key around the version.
+READ_SCRIPT = """
+local version = redis.call('GET', KEYS[1]) or '0'
+return {version, redis.call('GET', ARGV[1] .. version .. ARGV[2])}
+"""
+
+Loader = Callable[[], Awaitable[tuple[bytes, dict[str, str]]]]
+
+
+def encode_entry(body: bytes, headers: dict[str, str]) -> bytes:
+    """Pack a response body and its headers into a single cache value."""
+    return orjson.dumps(headers) + b"\n" + body
+
+
+def decode_entry(raw: bytes) -> tuple[bytes, dict[str, str]]:
+    """Inverse of `encode_entry`; orjson never emits a raw newline."""
+    headers, _, body = raw.partition(b"\n")
+    return body, orjson.loads(headers)
+
+
+class ContactsCache:
+    """Read-through cache of rendered contact responses.
+
+    Redis failures never fail a request: reads fall through to the
+    database and writes are skipped, counted as ``contacts_cache_errors``.
+    """
+
+    def __init__(self, client: Redis | None = None) -> None:
+        self.client: Redis = client or redis_client
+        self.enabled = app_settings.CONTACTS_CACHE_ENABLED
+        self.prefix = "contacts:v"
+        self.version_key = "contacts:version"
+        self.item_ttl_seconds = app_settings.CONTACTS_CACHE_ITEM_TTL
+        self.list_ttl_seconds = app_settings.CONTACTS_CACHE_LIST_TTL
+        self.hits = 0
+        self.misses = 0
+        self._read_script = self.client.register_script(READ_SCRIPT)
+
+    @staticmethod
+    def fingerprint(kind: str, params: dict) -> str:
+        """Return a short stable key suffix for a query and its parameters."""
+        digest = hashlib.blake2b(orjson.dumps(params, option=orjson.OPT_SORT_KEYS), digest_size=12)
+        return f":{kind}:{digest.hexdigest()}"
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+            metrics.incr("contacts_cache_hits")
+        else:
+            self.misses += 1
+            metrics.incr("contacts_cache_misses")
+        metrics.set_gauge("contacts_cache_hit_ratio", self.hits / (self.hits + self.misses))
+
+    async def read_through(
+        self,
+        kind: str,
+        params: dict,
+        ttl: int,
+        loader: Loader,
+        if_none_match: str | None = None,
+        content_etag: bool = False,
+    ) -> tuple[bytes | None, dict[str, str]]:
+        """Return the cached ``(body, headers)`` for a query, loading on a miss.
+
+        The entry is stored under the version read *before* loading, so a
+        write that commits meanwhile leaves it under an outdated version
+        instead of serving stale data.
+
+        With `content_etag` the entry is stored with the ETag of its body,
+        and a request whose `if_none_match` matches a cached entry gets
+        ``(None, headers)`` without the body being decoded or sent.
+        """
+        if not self.enabled:
+            return await loader()
+        suffix = self.fingerprint(kind, params)
+        try:
+            version, *cached = await self._read_script(keys=[self.version_key], args=[self.prefix, suffix])
+        except RedisError:
+            logger.warning("Contacts cache unavailable, reading from the database", exc_info=True)
+            metrics.incr("contacts_cache_errors")
+            return await loader()
+        if cached and cached[0] is not None:
+            self._record(hit=True)
+            body, headers = decode_entry(cached[0])
+            etag = headers.get("ETag")
+            if content_etag and etag and etag_matches(if_none_match, etag):
+                metrics.incr("contacts_cache_not_modified")
+                return None, {"ETag": etag}
+            return body, headers
+
+        self._record(hit=False)
+        body, headers = await loader()
+        if content_etag:
+            headers = {**headers, "ETag": make_etag(body)}
+        try:
+            await self.client.setex(self.prefix + version.decode() + suffix, ttl, encode_entry(body, headers))
+        except RedisError:
+            metrics.incr("contacts_cache_errors")
+        return body, headers
+
+    async def invalidate(self) -> None:
+        """Retire every cached contact response by bumping the version."""
+        if not self.enabled:
+            return
+        try:
+            await self.client.incr(self.version_key)
+        except RedisError:
+            logger.warning("Could not bump the contacts cache version", exc_info=True)
+            metrics.incr("contacts_cache_errors")
+
+
+contacts_cache = ContactsCache()
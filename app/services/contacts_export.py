@@ -0,0 +1,68 @@
+import csv
+import io
+from typing import AsyncIterator
+
+import orjson
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ..conf.config import app_settings
+from ..db.models import Contact
+from ..repositories.contacts import contacts_repository
+
+"""Constant-memory streaming export of contacts as NDJSON or CSV.
+
+Rows are read from a server-side cursor and encoded one batch at a time,
+so neither the result set nor the response body is ever held in memory.
+The CSV layout is accepted back by the bulk import.
+"""
+
+EXPORT_COLUMNS = [
+    Contact.id,
+    Contact.first_name,
+    Contact.last_name,
+    Contact.email,
+    Contact.phone,
+    Contact.birthday,
+    Contact.extra,
+    Contact.user_id,
+]
+FIELD_NAMES = [column.key for column in EXPORT_COLUMNS]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def encode_ndjson(rows) -> bytes:
+    return b"".join(orjson.dumps(dict(zip(FIELD_NAMES, row))) + b"\n" for row in rows)
+
+
+def encode_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def export_contacts(
+    session_factory: async_sessionmaker,
+    fmt: str,
+    search: str | None = None,
+    first_name: str | None = None,
+    last_name: str | None = None,
+    email: str | None = None,
+) -> AsyncIterator[bytes]:
+    """Yield the encoded export of every matching contact, one chunk per batch.
+
+    Opens its own session, which lives exactly as long as the response
+    body is being sent.
+    """
+    encode = encode_csv if fmt == "csv" else encode_ndjson
+    if fmt == "csv":
+        yield encode_csv([FIELD_NAMES])
+    async with session_factory() as db:
+        async for rows in contacts_repository.stream_contacts(
+            db, EXPORT_COLUMNS, search, first_name, last_name, email,
+            batch_size=app_settings.CONTACTS_EXPORT_BATCH_SIZE,
+        ):
+            yield encode(rows)
@@ -0,0 +1,217 @@
+import codecs
+import csv
+from typing import AsyncIterator, Literal
+
+import orjson
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..conf.config import app_settings
+from ..repositories.contacts import contacts_repository
+from ..schemas.contacts import ContactCreate
+
+"""Streaming bulk import of contacts from CSV or NDJSON request bodies.
+
+The body is decoded incrementally and parsed record by record, so memory
+use is bounded by the batch size rather than the upload size. Valid rows
+are written in batches by `ContactsRepository.upsert_contacts`, each
+batch in its own transaction; invalid rows are reported by line number.
+"""
+
+# Longest accepted line (or quoted CSV record), in characters
+MAX_LINE_LENGTH = 1 << 20
+
+FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+def import_format(content_type: str | None) -> str:
+    """Return the import format of a request content type.
+
+    Raises an HTTP 415 for anything but CSV or NDJSON.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Upload contacts as text/csv or application/x-ndjson",
+        )
+    return FORMATS[media_type]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a UTF-8 byte stream into lines without buffering it whole."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    try:
+        async for chunk in chunks:
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                yield line.removesuffix("\r")
+            if len(pending) > MAX_LINE_LENGTH:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Line too long")
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Upload is not valid UTF-8")
+    if pending:
+        yield pending.removesuffix("\r")
+
+
+async def ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """Yield ``(line, row, error)`` for every non-blank NDJSON line."""
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield number, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, row, None
+
+
+async def csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """Yield ``(line, row, error)`` for every CSV record after the header.
+
+    Quoted fields may span lines; a record is complete once its quotes are
+    balanced. Empty fields are omitted so optional columns default.
+    """
+    header = None
+    number = start = 0
+    record = ""
+    async for line in lines:
+        number += 1
+        if not record:
+            start = number
+            record = line
+        else:
+            record += "\n" + line
+        if record.count('"') % 2:
+            if len(record) > MAX_LINE_LENGTH:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Line too long")
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        try:
+            fields = next(csv.reader([text]))
+        except csv.Error as exc:
+            yield start, None, f"Invalid CSV: {exc}"
+            continue
+        if header is None:
+            header = [name.strip() for name in fields]
+            continue
+        if len(fields) != len(header):
+            yield start, None, f"Expected {len(header)} fields, got {len(fields)}"
+            continue
+        yield start, {name: value for name, value in zip(header, fields) if value != ""}, None
+    if record:
+        yield start, None, "Unterminated quoted field"
+
+
+def describe(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors())
+
+
+class ImportReport:
+    """Running counts of an import plus the first errors encountered."""
+
+    def __init__(self, max_errors: int) -> None:
+        self.rows = 0
+        self.written = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors: list[dict] = []
+        self.max_errors = max_errors
+
+    def fail(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "written": self.written,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+async def write_batch(
+    db: AsyncSession,
+    batch: dict[str, tuple[int, ContactCreate]],
+    on_conflict: Literal["skip", "update"],
+    report: ImportReport,
+) -> None:
+    """Upsert one batch; if the database rejects it, retry row by row to
+    pinpoint the offending lines."""
+    if not batch:
+        return
+    contacts = [contact for _, contact in batch.values()]
+    try:
+        written = await contacts_repository.upsert_contacts(db, contacts, on_conflict)
+    except IntegrityError:
+        written = 0
+        for line, contact in batch.values():
+            try:
+                written += await contacts_repository.upsert_contacts(db, [contact], on_conflict)
+            except IntegrityError:
+                report.fail(line, "Rejected by the database")
+                contacts.remove(contact)
+    report.written += written
+    report.skipped += len(contacts) - written
+
+
+async def import_contacts(
+    db: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    fmt: str,
+    on_conflict: Literal["skip", "update"],
+    default_user_id: int,
+) -> dict:
+    """Stream rows from `chunks` into the contacts table.
+
+    Rows without a ``user_id`` are assigned to `default_user_id`. Within a
+    batch, repeated emails collapse to the first row (``skip``) or the
+    last one (``update``), matching what the conflict policy does across
+    batches. Returns the import report.
+    """
+    report = ImportReport(app_settings.CONTACTS_IMPORT_MAX_ERRORS)
+    parse = csv_rows if fmt == "csv" else ndjson_rows
+    batch: dict[str, tuple[int, ContactCreate]] = {}
+    async for line, row, error in parse(iter_lines(chunks)):
+        report.rows += 1
+        if error:
+            report.fail(line, error)
+            continue
+        row.setdefault("user_id", default_user_id)
+        try:
+            contact = ContactCreate(**row)
+        except ValidationError as exc:
+            report.fail(line, describe(exc))
+            continue
+        if contact.email in batch:
+            report.skipped += 1
+            if on_conflict == "skip":
+                continue
+            del batch[contact.email]
+        batch[contact.email] = (line, contact)
+        if len(batch) >= app_settings.CONTACTS_IMPORT_BATCH_SIZE:
+            await write_batch(db, batch, on_conflict, report)
+            batch = {}
+    await write_batch(db, batch, on_conflict, report)
+    return report.as_dict()
@@ -1,28 +1,278 @@
+import asyncio
+import logging
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pydantic import EmailStr
 
 from .auth import auth_service
+from .jobs import job_queue
+from .metrics import metrics
 from ..conf.config import app_settings
 
-"""Email service for sending verification and other transactional emails."""
-
-conf = ConnectionConfig(
-    MAIL_USERNAME = app_settings.MAIL_USERNAME,
-    MAIL_PASSWORD = app_settings.MAIL_PASSWORD,
-    MAIL_FROM = app_settings.MAIL_FROM,
-    MAIL_PORT = app_settings.MAIL_PORT,
-    MAIL_SERVER = app_settings.MAIL_SERVER,
-    MAIL_FROM_NAME = app_settings.MAIL_FROM_NAME,
-    MAIL_STARTTLS = app_settings.MAIL_STARTTLS,
-    MAIL_SSL_TLS = app_settings.MAIL_SSL_TLS,
-    USE_CREDENTIALS = app_settings.USE_CREDENTIALS,
-    VALIDATE_CERTS = app_settings.VALIDATE_CERTS,
-    TEMPLATE_FOLDER=Path(__file__).parent / "templates"
+"""Email service for sending verification and other transactional emails.
+
+Messages are rendered from cached Jinja templates and handed to
+`mail_dispatcher`, which delivers them in batches over a small pool of
+authenticated SMTP connections, retrying failures with backoff. When the
+dispatcher is not running (job workers, scripts, tests) messages are sent
+directly over the same pool. The send functions are also registered as
+jobs for `app.worker`.
+"""
+
+logger = logging.getLogger(__name__)
+
+# Compiled templates are cached by the environment after first use
+templates = Environment(
+    loader=FileSystemLoader(Path(__file__).parent / "templates"),
+    autoescape=select_autoescape(["html"]),
+)
+
+
+def build_message(recipient: str, subject: str, template_name: str, context: dict) -> EmailMessage:
+    """Render `template_name` into an HTML message to `recipient`."""
+    message = EmailMessage()
+    message["From"] = formataddr((app_settings.MAIL_FROM_NAME, app_settings.MAIL_FROM))
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(templates.get_template(template_name).render(**context), subtype="html")
+    return message
+
+
+class SMTPPool:
+    """Up to `size` SMTP connections, kept open and logged in between sends."""
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        validate_certs: bool = True,
+        size: int = 4,
+        timeout: float = 30,
+    ) -> None:
+        self.options = dict(
+            hostname=hostname,
+            port=port,
+            username=username,
+            password=password,
+            use_tls=use_tls,
+            start_tls=start_tls,
+            validate_certs=validate_certs,
+            timeout=timeout,
+        )
+        self.size = size
+        self._idle: list[aiosmtplib.SMTP] = []
+        self._slots = asyncio.Semaphore(size)
+
+    @classmethod
+    def from_settings(cls) -> "SMTPPool":
+        return cls(
+            hostname=app_settings.MAIL_SERVER,
+            port=app_settings.MAIL_PORT,
+            username=app_settings.MAIL_USERNAME if app_settings.USE_CREDENTIALS else None,
+            password=app_settings.MAIL_PASSWORD if app_settings.USE_CREDENTIALS else None,
+            use_tls=app_settings.MAIL_SSL_TLS,
+            start_tls=app_settings.MAIL_STARTTLS,
+            validate_certs=app_settings.VALIDATE_CERTS,
+            size=app_settings.MAIL_POOL_SIZE,
+        )
+
+    async def _connection(self) -> aiosmtplib.SMTP:
+        while self._idle:
+            client = self._idle.pop()
+            if client.is_connected:
+                return client
+        return await self._open()
+
+    async def _open(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(**self.options)
+        await client.connect()
+        metrics.incr("mail_connections_opened")
+        return client
+
+    async def send(self, messages: list[EmailMessage]) -> list[Exception | None]:
+        """Send `messages` over one pooled connection.
+
+        Returns one result per message: None when sent, else the error.
+        A connection that failed is dropped instead of returned; the batch
+        reconnects once and retries the message before giving up on it.
+        """
+        async with self._slots:
+            try:
+                client = await self._connection()
+            except (aiosmtplib.SMTPException, OSError) as err:
+                return [err] * len(messages)
+            results: list[Exception | None] = []
+            reconnected = False
+            while len(results) < len(messages):
+                try:
+                    await client.send_message(messages[len(results)])
+                    results.append(None)
+                except aiosmtplib.SMTPResponseException as err:
+                    # Rejected by the server; the connection is still usable
+                    results.append(err)
+                except (aiosmtplib.SMTPException, OSError) as err:
+                    client.close()
+                    if not reconnected:
+                        # Usually an idle connection the server has since closed
+                        reconnected = True
+                        metrics.incr("mail_reconnects")
+                        try:
+                            client = await self._open()
+                            continue
+                        except (aiosmtplib.SMTPException, OSError) as connect_err:
+                            err = connect_err
+                    results.extend([err] * (len(messages) - len(results)))
+                    return results
+            self._idle.append(client)
+            return results
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for client in idle:
+            try:
+                await client.quit()
+            except (aiosmtplib.SMTPException, OSError):
+                client.close()
+
+
+class OutgoingMail:
+    __slots__ = ("message", "attempts")
+
+    def __init__(self, message: EmailMessage) -> None:
+        self.message = message
+        self.attempts = 0
+
+
+class MailDispatcher:
+    """Queue of outgoing mail drained by one sender task per pooled connection.
+
+    Each sender takes whatever is queued, up to `batch_size` messages, and
+    sends it over a single connection. Failed messages are retried after
+    ``retry_base * 2**attempt`` seconds, up to `max_attempts` times.
+    """
+
+    def __init__(
+        self,
+        pool: SMTPPool,
+        queue_size: int = 10000,
+        batch_size: int = 50,
+        max_attempts: int = 5,
+        retry_base: float = 1,
+    ) -> None:
+        self.pool = pool
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.queue: asyncio.Queue[OutgoingMail] | None = None
+        self.queue_size = queue_size
+        self.raise_errors = False
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return self.queue is not None
+
+    def start(self) -> None:
+        """Start the sender tasks on the running event loop."""
+        self.queue = asyncio.Queue(self.queue_size)
+        for _ in range(self.pool.size):
+            self._spawn(self._sender())
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Deliver what is queued (for at most `timeout` seconds), then stop."""
+        if self.queue is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %d unsent emails on shutdown", self.queue.qsize())
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.queue = None
+        await self.pool.close()
+
+    async def send(self, message: EmailMessage) -> None:
+        """Queue `message` for delivery, or send it now if not running.
+
+        A failed direct send is logged, or raised when `raise_errors` is
+        set so that a job worker retries the job.
+        """
+        if self.queue is None:
+            error = (await self.pool.send([message]))[0]
+            if error is not None:
+                if self.raise_errors:
+                    raise error
+                logger.error("Could not send email to %s: %s", message["To"], error)
+            return
+        try:
+            self.queue.put_nowait(OutgoingMail(message))
+        except asyncio.QueueFull:
+            metrics.incr("mail_dropped")
+            logger.error("Mail queue full, dropping email to %s", message["To"])
+            return
+        metrics.set_gauge("mail_queue_depth", self.queue.qsize())
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _retry_later(self, mail: OutgoingMail) -> None:
+        try:
+            await asyncio.sleep(self.retry_base * 2 ** (mail.attempts - 1))
+            self.queue.put_nowait(mail)
+        except asyncio.QueueFull:
+            metrics.incr("mail_failed")
+            logger.error("Mail queue full, giving up on email to %s", mail.message["To"])
+        finally:
+            # The original item is done either way, or queue.join() never returns
+            self.queue.task_done()
+
+    async def _sender(self) -> None:
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            metrics.set_gauge("mail_queue_depth", self.queue.qsize())
+
+            started = time.perf_counter()
+            results = await self.pool.send([mail.message for mail in batch])
+            metrics.observe("mail_batch_seconds", time.perf_counter() - started)
+            for mail, error in zip(batch, results):
+                mail.attempts += 1
+                if error is None:
+                    metrics.incr("mail_sent")
+                elif mail.attempts < self.max_attempts:
+                    metrics.incr("mail_retried")
+                    # Still counts as unfinished for queue.join() until re-queued
+                    self._spawn(self._retry_later(mail))
+                    continue
+                else:
+                    metrics.incr("mail_failed")
+                    logger.error("Giving up on email to %s: %s", mail.message["To"], error)
+                self.queue.task_done()
+
+
+mail_dispatcher = MailDispatcher(
+    SMTPPool.from_settings(),
+    queue_size=app_settings.MAIL_QUEUE_SIZE,
+    batch_size=app_settings.MAIL_BATCH_SIZE,
+    max_attempts=app_settings.MAIL_MAX_ATTEMPTS,
+    retry_base=app_settings.MAIL_RETRY_BASE_SECONDS,
 )
 
+
+@job_queue.job("send_email")
 async def send_email(email: EmailStr, username: str, host: str):
     """Send a verification email containing a confirmation link.
 
@@ -31,25 +281,16 @@ async def send_email(email: EmailStr, username: str, host: str):
         username: Recipient user name for personalization.
         host: Base URL of the API used to build confirmation links.
     """
-    try:
-        token_verification = await auth_service.create_access_token({"sub": email})
-
-        message = MessageSchema(
-            subject="Verify your email",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "username": username,
-                "token": token_verification
-            },
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="verify_email.html")
-    except ConnectionErrors as err:
-        print(err)
+    token_verification = await auth_service.create_access_token({"sub": email})
+    message = build_message(
+        email,
+        "Verify your email",
+        "verify_email.html",
+        {"host": host, "username": username, "token": token_verification},
+    )
+    await mail_dispatcher.send(message)
 
+@job_queue.job("send_password_reset_email", secrets=("reset_token",))
 async def send_password_reset_email(email: EmailStr, username: str, host: str, reset_token: str):
     """Send a password reset email with a tokenized link.
 
@@ -59,19 +300,10 @@ async def send_password_reset_email(email: EmailStr, username: str, host: str, r
         host: Base URL of the API used to build reset link.
         reset_token: Pre-generated reset token for the user.
     """
-    try:
-        message = MessageSchema(
-            subject="Reset your password",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "username": username,
-                "token": reset_token
-            },
-            subtype=MessageType.html
-        )
-        fm = FastMail(conf)
-        # Reuse verify template for simplicity if no reset template provided
-        await fm.send_message(message, template_name="reset_password_email.html")
-    except ConnectionErrors as err:
-        print(err)
\ No newline at end of file
+    message = build_message(
+        email,
+        "Reset your password",
+        "reset_password_email.html",
+        {"host": host, "username": username, "token": reset_token},
+    )
+    await mail_dispatcher.send(message)
@@ -0,0 +1,50 @@
+import hashlib
+
+import orjson
+from fastapi import Request, Response, status
+
+"""Strong ETags and conditional GET helpers.
+
+Handlers derive an ETag from whatever already identifies the state they
+return (a row version, the body stored in the contacts cache, a cached user),
+so a matching ``If-None-Match`` can be answered with 304 before any body
+is loaded or rendered.
+"""
+
+# Clients must revalidate every time; responses are per user, never shared
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Return a strong, quoted ETag identifying `parts`."""
+    digest = hashlib.blake2b(orjson.dumps(parts, default=str), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an ``If-None-Match`` header value matches `etag`.
+
+    Uses the weak comparison RFC 9110 prescribes for ``If-None-Match``.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def conditional_response(request: Request, body: bytes, headers: dict[str, str], media_type: str = "application/json") -> Response:
+    """Answer 304 if the request already holds this representation,
+    otherwise return `body`. Hashes the body when `headers` lack an ETag."""
+    etag = headers.get("ETag") or make_etag(body)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={**headers, "ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
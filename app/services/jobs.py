@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+import orjson
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+
+from ..conf.config import app_settings
+from ..conf.redis import redis_client
+from .metrics import metrics
+
+"""Durable background jobs on a Redis stream.
+
+API handlers `enqueue` jobs and return; ``python -m app.worker`` runs
+them. Workers read through a consumer group, so each job goes to one
+worker and stays pending until acknowledged. Failed jobs are re-added
+with backoff up to `JOBS_MAX_ATTEMPTS` times, then moved to a dead-letter
+stream, with the payload fields a job declares secret redacted. Jobs left
+pending by a crashed worker are reclaimed by another after
+`JOBS_CLAIM_IDLE_SECONDS`.
+
+Only work the client does not wait for belongs here. Avatar uploads stay
+in the API: the response carries the new avatar URL, and the image would
+otherwise have to travel through Redis.
+"""
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[None]]
+
+REDACTED = "[redacted]"
+
+
+class JobQueue:
+    """Producer side of the queue plus the registry of job handlers."""
+
+    def __init__(self, client: Redis | None = None) -> None:
+        self.client: Redis = client or redis_client
+        self.enabled = app_settings.JOBS_ENABLED
+        self.stream = "jobs"
+        self.dead_letter_stream = "jobs:dead"
+        self.group = "workers"
+        self.maxlen = app_settings.JOBS_STREAM_MAXLEN
+        self.handlers: dict[str, Handler] = {}
+        self.secrets: dict[str, tuple[str, ...]] = {}
+
+    def job(self, name: str, secrets: tuple[str, ...] = ()):
+        """Register the decorated coroutine function as the handler of `name`.
+
+        Payload fields named in `secrets` (tokens and the like) are redacted
+        when the job is dead-lettered.
+        """
+        def register(func: Handler) -> Handler:
+            self.handlers[name] = func
+            self.secrets[name] = secrets
+            return func
+        return register
+
+    def redact(self, fields: dict) -> dict:
+        """Copy of a job's stream fields with its secret payload fields redacted."""
+        secrets = self.secrets.get(fields[b"name"].decode(), ())
+        if not secrets:
+            return fields
+        payload = orjson.loads(fields[b"payload"])
+        redacted = {key: REDACTED if key in secrets else value for key, value in payload.items()}
+        return {**fields, b"payload": orjson.dumps(redacted)}
+
+    async def enqueue(self, name: str, /, **payload) -> bool:
+        """Add a job; returns False if the queue is disabled or unreachable,
+        so callers can fall back to running it in-process."""
+        if not self.enabled:
+            return False
+        fields = {"name": name, "payload": orjson.dumps(payload), "attempts": 0, "enqueued_at": time.time()}
+        try:
+            await self.client.xadd(self.stream, fields, maxlen=self.maxlen, approximate=True)
+        except RedisError:
+            logger.warning("Job queue unavailable, %s not enqueued", name, exc_info=True)
+            metrics.incr("jobs_enqueue_errors")
+            return False
+        metrics.incr("jobs_enqueued")
+        return True
+
+
+class Worker:
+    """Consumer running up to `concurrency` jobs at a time."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        consumer: str,
+        concurrency: int = 8,
+        max_attempts: int = 5,
+        retry_base: float = 2,
+        claim_idle: float = 60,
+    ) -> None:
+        self.queue = queue
+        self.client = queue.client
+        self.consumer = consumer
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.claim_idle_ms = int(claim_idle * 1000)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        self._retries: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.client.xgroup_create(self.queue.stream, self.queue.group, id="0", mkstream=True)
+        except ResponseError as err:
+            if "BUSYGROUP" not in str(err):
+                raise
+
+    async def read(self, count: int, block_ms: int = 5000) -> list[tuple[bytes, dict]]:
+        """Return up to `count` new jobs for this consumer."""
+        response = await self.client.xreadgroup(
+            self.queue.group, self.consumer, {self.queue.stream: ">"}, count=count, block=block_ms
+        )
+        return [entry for _, entries in response for entry in entries]
+
+    async def claim_stale(self, count: int) -> list[tuple[bytes, dict]]:
+        """Take over jobs another consumer left pending for too long.
+
+        Jobs delivered more than `max_attempts` times (e.g. ones that crash
+        the worker process) are dead-lettered instead of run again.
+        """
+        _, entries, *_ = await self.client.xautoclaim(
+            self.queue.stream, self.queue.group, self.consumer,
+            min_idle_time=self.claim_idle_ms, start_id="0-0", count=count,
+        )
+        claimed = []
+        for entry_id, fields in entries:
+            if not fields:
+                continue
+            pending = await self.client.xpending_range(
+                self.queue.stream, self.queue.group, min=entry_id, max=entry_id, count=1
+            )
+            if pending and pending[0]["times_delivered"] > self.max_attempts:
+                metrics.incr("jobs_dead_lettered")
+                dead = {**self.queue.redact(fields), b"error": "Abandoned by workers too many times"}
+                await self._finish(entry_id, dead=dead)
+                continue
+            claimed.append((entry_id, fields))
+        metrics.incr("jobs_reclaimed", len(claimed))
+        return claimed
+
+    async def _finish(self, entry_id: bytes, retry: dict | None = None, dead: dict | None = None) -> None:
+        """Acknowledge a job, re-adding or dead-lettering it atomically."""
+        async with self.client.pipeline(transaction=True) as pipe:
+            if retry is not None:
+                pipe.xadd(self.queue.stream, retry, maxlen=self.queue.maxlen, approximate=True)
+            if dead is not None:
+                pipe.xadd(self.queue.dead_letter_stream, dead, maxlen=self.queue.maxlen, approximate=True)
+            pipe.xack(self.queue.stream, self.queue.group, entry_id)
+            await pipe.execute()
+
+    async def process(self, entry_id: bytes, fields: dict) -> None:
+        """Run one job and settle it: ack, retry later or dead-letter."""
+        name = fields[b"name"].decode()
+        attempts = int(fields.get(b"attempts", 0)) + 1
+        handler = self.queue.handlers.get(name)
+        started = time.perf_counter()
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job {name!r}")
+            await handler(**orjson.loads(fields[b"payload"]))
+        except Exception as err:
+            metrics.incr("jobs_failed")
+            if attempts >= self.max_attempts or handler is None:
+                logger.exception("Job %s %s dead-lettered after %d attempts", name, entry_id, attempts)
+                metrics.incr("jobs_dead_lettered")
+                dead = {**self.queue.redact(fields), b"attempts": attempts, b"error": repr(err)}
+                await self._finish(entry_id, dead=dead)
+            else:
+                logger.warning("Job %s %s failed (attempt %d), retrying", name, entry_id, attempts, exc_info=True)
+                settled = {**fields, b"attempts": attempts, b"error": repr(err)}
+                retry = asyncio.create_task(self._retry_later(entry_id, settled, self.retry_base * 2 ** (attempts - 1)))
+                self._retries.add(retry)
+                retry.add_done_callback(self._retries.discard)
+            return
+        metrics.observe("job_seconds", time.perf_counter() - started)
+        metrics.incr("jobs_completed")
+        await self._finish(entry_id)
+
+    async def _retry_later(self, entry_id: bytes, fields: dict, delay: float) -> None:
+        # The job stays pending, and reclaimable, until it is re-added
+        await asyncio.sleep(delay)
+        try:
+            await self._finish(entry_id, retry=fields)
+        except RedisError:
+            logger.exception("Could not re-add job %s; it will be reclaimed", entry_id)
+
+    async def _run(self, entry_id: bytes, fields: dict) -> None:
+        try:
+            await self.process(entry_id, fields)
+        except RedisError:
+            logger.exception("Could not settle job %s; it will be reclaimed", entry_id)
+        finally:
+            self._slots.release()
+
+    async def _dispatch(self, entries: list[tuple[bytes, dict]]) -> None:
+        for entry_id, fields in entries:
+            await self._slots.acquire()
+            task = asyncio.create_task(self._run(entry_id, fields))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self, claim_interval: float = 30) -> None:
+        """Process jobs until `stop` is called, then wait for running ones.
+
+        Retries still waiting out their backoff are abandoned on stop; their
+        jobs are still pending and get reclaimed.
+        """
+        await self.ensure_group()
+        next_claim = 0.0
+        while not self._stopping.is_set():
+            free = max(1, self.concurrency - len(self._tasks))
+            try:
+                if time.monotonic() >= next_claim:
+                    next_claim = time.monotonic() + claim_interval
+                    await self._dispatch(await self.claim_stale(free))
+                await self._dispatch(await self.read(free, block_ms=1000))
+            except RedisError:
+                logger.exception("Job queue unavailable, retrying")
+                await asyncio.sleep(1)
+            metrics.set_gauge("jobs_running", len(self._tasks))
+        for retry in list(self._retries):
+            retry.cancel()
+        await asyncio.gather(*self._tasks, *self._retries, return_exceptions=True)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,81 @@
+import threading
+from collections import defaultdict, deque
+
+"""In-process metrics: counters, gauges and timing summaries.
+
+Values are per worker process and exposed as JSON by the admin-only
+metrics endpoint. Recording is thread-safe so executors can report too.
+"""
+
+# Number of most recent samples kept per timing for percentiles
+TIMING_WINDOW = 1024
+
+
+class Timing:
+    """Running count/sum/max of a duration plus a window of recent samples."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: deque[float] = deque(maxlen=TIMING_WINDOW)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.max,
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+        }
+
+
+class Metrics:
+    """Registry of named counters, gauges and timings."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: dict[str, int] = defaultdict(int)
+        self.gauges: dict[str, float] = {}
+        self.timings: dict[str, Timing] = defaultdict(Timing)
+
+    def incr(self, name: str, value: int = 1) -> None:
+        """Increase counter `name` by `value`."""
+        with self._lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set gauge `name` to its current `value`."""
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one duration sample for timing `name`."""
+        with self._lock:
+            self.timings[name].observe(seconds)
+
+    def snapshot(self) -> dict:
+        """Return a JSON-serializable copy of every metric."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "timings": {name: timing.summary() for name, timing in self.timings.items()},
+            }
+
+
+metrics = Metrics()
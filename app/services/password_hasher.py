@@ -0,0 +1,85 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from .metrics import metrics
+
+"""Password hashing configuration and a bounded worker pool that keeps
+hashing off the event loop.
+
+bcrypt and argon2 release the GIL while hashing, so a thread pool gives
+real parallelism without the pickling cost of a process pool.
+"""
+
+
+def create_password_context(
+    scheme: str = "bcrypt",
+    bcrypt_rounds: int = 12,
+    argon2_time_cost: int = 3,
+    argon2_memory_cost: int = 65536,
+    argon2_parallelism: int = 4,
+) -> CryptContext:
+    """Build a context that hashes with `scheme` and verifies bcrypt and argon2id.
+
+    Hashes made with the other scheme or with weaker parameters than the
+    configured ones are reported as needing an update, which lets callers
+    rehash them transparently after a successful verification.
+    """
+    return CryptContext(
+        schemes=["argon2", "bcrypt"],
+        default=scheme,
+        deprecated="auto",
+        bcrypt__rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        argon2__type="ID",
+        argon2__time_cost=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+class PasswordHasherPool:
+    """Run CPU-heavy hashing calls on at most `max_workers` threads.
+
+    At most `max_queue` calls may wait for a free thread; beyond that new
+    calls are rejected with HTTP 503 instead of piling up behind bcrypt.
+    The time each call spends waiting is recorded as
+    ``password_hash_queue_wait_seconds``.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._pending = 0
+
+    async def run(self, func, *args):
+        """Run ``func(*args)`` on the pool and return its result."""
+        if self._pending >= self.max_workers + self.max_queue:
+            metrics.incr("password_hash_rejected")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        submitted = time.perf_counter()
+
+        def job():
+            metrics.observe("password_hash_queue_wait_seconds", time.perf_counter() - submitted)
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                metrics.observe("password_hash_seconds", time.perf_counter() - started)
+
+        self._pending += 1
+        metrics.set_gauge("password_hash_pending", self._pending)
+        try:
+            return await asyncio.wrap_future(self._executor.submit(job))
+        finally:
+            self._pending -= 1
+            metrics.set_gauge("password_hash_pending", self._pending)
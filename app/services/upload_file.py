@@ -1,32 +1,259 @@
+import abc
+import asyncio
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import cloudinary
 import cloudinary.uploader
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, ImageOps, UnidentifiedImageError
 
-"""Service for uploading files to Cloudinary and returning resized URLs."""
+from .metrics import metrics
+from ..conf.config import app_settings
 
-class UploadFileService:
-    def __init__(self, cloud_name, api_key, api_secret):
-        """Initialize Cloudinary configuration using provided credentials."""
-        self.cloud_name = cloud_name
-        self.api_key = api_key
-        self.api_secret = api_secret
-        cloudinary.config(
-            cloud_name = self.cloud_name,
-            api_key = self.api_key,
-            api_secret = self.api_secret,
-            secure  = True
+"""Avatar uploads: size-capped reads, local thumbnailing and storage backends.
+
+The upload is read from the request in chunks and rejected with 413 once it
+exceeds `AVATAR_MAX_BYTES`. Decoding, resizing to a 200x200 thumbnail and
+the (blocking) backend upload run on a small thread pool, so a slow image
+or storage service never stalls the event loop. `STORAGE_BACKEND` picks
+Cloudinary, the local filesystem or an S3-compatible bucket.
+
+Thumbnails are stored under the SHA-256 of the uploaded bytes, so an
+image already stored (by any user) is never processed or uploaded again,
+and re-uploading the current avatar changes nothing at all.
+"""
+
+AVATAR_SIZE = (200, 200)
+AVATAR_FORMAT = "WEBP"
+AVATAR_CONTENT_TYPE = "image/webp"
+
+
+async def read_upload(file: UploadFile, max_bytes: int, chunk_size: int = 65536) -> tuple[bytes, str]:
+    """Read `file` in chunks, failing with 413 as soon as it exceeds `max_bytes`.
+
+    Returns the content and its hex SHA-256, hashed as it is read.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+    buffer = bytearray()
+    digest = hashlib.sha256()
+    while chunk := await file.read(chunk_size):
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+        digest.update(chunk)
+    return bytes(buffer), digest.hexdigest()
+
+
+def make_thumbnail(data: bytes, size: tuple[int, int] = AVATAR_SIZE) -> bytes:
+    """Center-crop and resize an image to `size`, encoded as `AVATAR_FORMAT`.
+
+    Raises ValueError if `data` is not an image Pillow can decode.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # JPEGs are decoded at a reduced scale close to the target size
+            image.draft("RGB", (size[0] * 2, size[1] * 2))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            thumbnail = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as err:
+        raise ValueError("Not a valid image") from err
+    output = io.BytesIO()
+    thumbnail.save(output, AVATAR_FORMAT, quality=85, method=4)
+    return output.getvalue()
+
+
+class StorageBackend(abc.ABC):
+    """Stores objects under a key and returns their public URL.
+
+    Methods are blocking; `UploadFileService` calls them off the event loop.
+    Keys are content-addressed, so objects are never overwritten with
+    different bytes and may be cached forever.
+    """
+
+    @abc.abstractmethod
+    def save(self, key: str, data: bytes, content_type: str) -> str:
+        """Store `data` under `key` and return its public URL."""
+
+    @abc.abstractmethod
+    def exists(self, key: str) -> bool:
+        """Whether an object is already stored under `key`."""
+
+    @abc.abstractmethod
+    def url(self, key: str) -> str:
+        """Public URL of the object stored under `key`."""
+
+
+class LocalStorage(StorageBackend):
+    """Files under `root`, served by the app at `base_url` (see `app.main`)."""
+
+    def __init__(self, root: str | Path, base_url: str) -> None:
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def save(self, key: str, data: bytes, content_type: str) -> str:
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written aside and renamed, so readers never see a partial file; the
+        # name is unique per thread, as two uploads of one image share a key
+        partial = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        partial.write_bytes(data)
+        os.replace(partial, path)
+        return self.url(key)
+
+    def exists(self, key: str) -> bool:
+        return (self.root / key).is_file()
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+
+class CloudinaryStorage(StorageBackend):
+    """Cloudinary uploads, configured once for the process."""
+
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str) -> None:
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+
+    def save(self, key: str, data: bytes, content_type: str) -> str:
+        public_id, _, _ = key.rpartition(".")
+        r = cloudinary.uploader.upload(io.BytesIO(data), public_id=public_id, overwrite=False, resource_type="image")
+        return r["secure_url"]
+
+    def exists(self, key: str) -> bool:
+        # Asks the CDN, not the rate-limited Admin API. Any failure counts as
+        # missing: the upload that follows never overwrites an existing asset.
+        request = urllib.request.Request(self.url(key), method="HEAD")
+        try:
+            with urllib.request.urlopen(request, timeout=5):
+                return True
+        except OSError:
+            return False
+
+    def url(self, key: str) -> str:
+        public_id, _, extension = key.rpartition(".")
+        return cloudinary.CloudinaryImage(public_id).build_url(format=extension)
+
+
+class S3Storage(StorageBackend):
+    """An S3-compatible bucket (AWS, MinIO, R2, ...); needs the `s3` extra.
+
+    Credentials come from the usual boto3 sources (environment, profile,
+    instance role). Objects are served from `public_url`, by default the
+    bucket's path on the endpoint.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        public_url: str | None = None,
+    ) -> None:
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError as err:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (install the 's3' extra)") from err
+        self.bucket = bucket
+        self.client_error = ClientError
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None, region_name=region or None)
+        if not public_url:
+            public_url = f"{endpoint_url}/{bucket}" if endpoint_url else f"https://{bucket}.s3.amazonaws.com"
+        self.public_url = public_url.rstrip("/")
+
+    def save(self, key: str, data: bytes, content_type: str) -> str:
+        self.client.put_object(
+            Bucket=self.bucket, Key=key, Body=data, ContentType=content_type,
+            CacheControl="public, max-age=31536000, immutable",
         )
+        return self.url(key)
 
-    @staticmethod
-    def upload_file(file, username) -> str:
-        """Upload a file to Cloudinary and return a 200x200 fill-cropped URL."""
-        public_id = f"{username}/{file.filename}"
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except self.client_error as err:
+            if err.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
 
-        r = cloudinary.uploader.upload(
-            file.file,
-            public_id = public_id,
-            overwrite = True
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+
+def storage_from_settings() -> StorageBackend:
+    if app_settings.STORAGE_BACKEND == "local":
+        return LocalStorage(app_settings.LOCAL_STORAGE_PATH, app_settings.LOCAL_STORAGE_URL)
+    if app_settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            app_settings.S3_BUCKET,
+            endpoint_url=app_settings.S3_ENDPOINT_URL,
+            region=app_settings.S3_REGION,
+            public_url=app_settings.S3_PUBLIC_URL,
         )
+    return CloudinaryStorage(
+        app_settings.CLOUDINARY_NAME, app_settings.CLOUDINARY_API_KEY, app_settings.CLOUDINARY_API_SECRET
+    )
+
+
+def avatar_key(digest: str) -> str:
+    """Storage key of the thumbnail of the image hashing to `digest`."""
+    width, height = AVATAR_SIZE
+    return f"avatars/{width}x{height}/{digest}.webp"
+
+
+class UploadFileService:
+    """Thumbnail and store avatars on `backend` using at most `max_workers` threads."""
+
+    def __init__(self, backend: StorageBackend, max_bytes: int, max_workers: int = 4) -> None:
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload")
+
+    def _store_avatar(self, data: bytes, digest: str) -> str:
+        key = avatar_key(digest)
+        if self.backend.exists(key):
+            metrics.incr("avatar_uploads_deduplicated")
+            return self.backend.url(key)
+        started = time.perf_counter()
+        try:
+            thumbnail = make_thumbnail(data)
+        finally:
+            metrics.observe("avatar_resize_seconds", time.perf_counter() - started)
+        started = time.perf_counter()
+        try:
+            return self.backend.save(key, thumbnail, AVATAR_CONTENT_TYPE)
+        finally:
+            metrics.observe("avatar_store_seconds", time.perf_counter() - started)
+
+    async def upload_avatar(self, file: UploadFile, current_hash: str | None = None) -> tuple[str, str] | None:
+        """Store a 200x200 thumbnail of the uploaded image.
+
+        Returns ``(url, content hash)``, or None when the upload hashes to
+        `current_hash` and nothing needs to change. Raises 413 for files
+        over `max_bytes` and 400 for non-images.
+        """
+        data, digest = await read_upload(file, self.max_bytes)
+        if digest == current_hash:
+            metrics.incr("avatar_uploads_unchanged")
+            return None
+        loop = asyncio.get_running_loop()
+        try:
+            url = await loop.run_in_executor(self._executor, self._store_avatar, data, digest)
+        except ValueError as err:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err)) from err
+        return url, digest
 
-        src_url = cloudinary.CloudinaryImage(public_id).build_url(width = 200, height = 200, crop = "fill", version = r.get("version"))
 
-        return src_url
\ No newline at end of file
+upload_service = UploadFileService(
+    storage_from_settings(), app_settings.AVATAR_MAX_BYTES, app_settings.UPLOAD_WORKERS
+)
@@ -0,0 +1,87 @@
+import argparse
+import statistics
+import time
+
+from app.services.password_hasher import create_password_context
+
+"""Pick password hashing costs that meet a target latency on this machine.
+
+Usage::
+
+    python -m app.tools.calibrate_hashing --target-ms 250
+    python -m app.tools.calibrate_hashing --scheme argon2 --memory-kib 65536
+
+Prints the settings to put into the environment (.env). Run it on the
+hardware that serves logins; costs are only meaningful per machine.
+"""
+
+SAMPLE_PASSWORD = "calibration-password"
+
+
+def measure(context, samples: int) -> float:
+    """Return the median time in milliseconds of hashing with `context`."""
+    context.hash(SAMPLE_PASSWORD)  # warm up: backend loading is not part of the cost
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash(SAMPLE_PASSWORD)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate_bcrypt(target_ms: float, samples: int) -> dict:
+    """Return the highest bcrypt cost whose hash time stays within `target_ms`."""
+    best = 4
+    for rounds in range(4, 32):
+        elapsed = measure(create_password_context("bcrypt", bcrypt_rounds=rounds), samples)
+        print(f"bcrypt rounds={rounds}: {elapsed:.1f} ms")
+        if elapsed > target_ms:
+            break
+        best = rounds
+    return {"PASSWORD_HASH_SCHEME": "bcrypt", "BCRYPT_ROUNDS": best}
+
+
+def calibrate_argon2(target_ms: float, samples: int, memory_kib: int, parallelism: int) -> dict:
+    """Return the highest argon2id time cost that stays within `target_ms` at fixed memory."""
+    best = 1
+    for time_cost in range(1, 64):
+        context = create_password_context(
+            "argon2",
+            argon2_time_cost=time_cost,
+            argon2_memory_cost=memory_kib,
+            argon2_parallelism=parallelism,
+        )
+        elapsed = measure(context, samples)
+        print(f"argon2id t={time_cost} m={memory_kib}KiB p={parallelism}: {elapsed:.1f} ms")
+        if elapsed > target_ms:
+            break
+        best = time_cost
+    return {
+        "PASSWORD_HASH_SCHEME": "argon2",
+        "ARGON2_TIME_COST": best,
+        "ARGON2_MEMORY_COST": memory_kib,
+        "ARGON2_PARALLELISM": parallelism,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Pick password hashing costs for a target latency.")
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250, help="acceptable hash time per login")
+    parser.add_argument("--samples", type=int, default=5, help="hashes measured per candidate cost")
+    parser.add_argument("--memory-kib", type=int, default=65536, help="argon2 memory cost")
+    parser.add_argument("--parallelism", type=int, default=4, help="argon2 lanes")
+    args = parser.parse_args(argv)
+
+    if args.scheme == "bcrypt":
+        settings = calibrate_bcrypt(args.target_ms, args.samples)
+    else:
+        settings = calibrate_argon2(args.target_ms, args.samples, args.memory_kib, args.parallelism)
+
+    print()
+    for name, value in settings.items():
+        print(f"{name}={value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""Realistic-looking values for synthetic contacts.
+
+Shared by the seeding CLI and the offline benchmarks, so generated data
+looks the same wherever it is produced.
+"""
+
+FIRST_NAMES = [
+    "Olivia", "Liam", "Emma", "Noah", "Amelia", "Oliver", "Sophia", "Elijah", "Mia", "James", "Isabella",
+    "William", "Ava", "Benjamin", "Evelyn", "Lucas", "Harper", "Henry", "Luna", "Theodore", "Camila", "Jack",
+    "Gianna", "Levi", "Elizabeth", "Alexander", "Eleanor", "Jackson", "Ella", "Mateo", "Abigail", "Daniel",
+    "Sofia", "Michael", "Avery", "Mason", "Scarlett", "Sebastian", "Emily", "Ethan", "Aria", "Logan", "Penelope",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson", "Walker",
+    "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores", "Green", "Adams", "Nelson",
+]
+NOTES = ["met at a conference", "college friend", "neighbour", "former colleague", "gym", "plumber"]
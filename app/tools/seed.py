@@ -0,0 +1,196 @@
+import argparse
+import csv
+import io
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, event, func, inspect, select
+
+from app.conf.config import app_settings
+from app.db.search import SQLITE_DDL
+from app.db.models import Contact, User, birthday_key
+from app.services.auth import auth_service
+from app.tools.sample_data import FIRST_NAMES, LAST_NAMES, NOTES
+
+"""Fill a database with large volumes of synthetic users and contacts.
+
+Usage::
+
+    python -m app.tools.seed --users 10000 --contacts 2000000
+    python -m app.tools.seed --database-url sqlite:///./load.db --contacts 500000
+
+Meant for reproducing production-scale query plans locally; the schema
+must already exist (``alembic upgrade head``). Rows are written in
+batches, each in its own transaction: ``COPY`` on PostgreSQL (psycopg2),
+``executemany`` elsewhere, with the SQLite search index rebuilt once at
+the end instead of row by row. Every batch draws from its own RNG seeded
+with ``--seed`` and its position, so the same ``--seed`` and
+``--batch-size`` always produce the same rows, and an interrupted run
+resumes after the last committed batch when started again. All seeded
+users share one password (hashed once) and an ``@seed.example.com``
+address; nothing else in the database is touched.
+"""
+
+EMAIL_DOMAIN = "seed.example.com"
+
+USER_COLUMNS = ("email", "username", "password", "confirmed", "role", "created_at")
+CONTACT_COLUMNS = ("first_name", "last_name", "email", "phone", "birthday", "birthday_key", "extra", "user_id")
+
+# Birthdays are uniform over these years, hence over the days of the year
+FIRST_BIRTHDAY = date(1940, 1, 1)
+BIRTHDAY_SPAN_DAYS = (date(2010, 12, 31) - FIRST_BIRTHDAY).days
+
+
+def batches(seed: int, kind: str, start: int, total: int, batch_size: int, make_row):
+    """Yield rows ``start..total-1`` of `kind` in batches of at most `batch_size`.
+
+    Row ``i`` only depends on `seed`, `batch_size` and ``i``: each batch is
+    generated from its own RNG, and a resumed run regenerates the batch it
+    stopped in and drops the rows already written.
+    """
+    for first in range(start - start % batch_size, total, batch_size):
+        rng = random.Random(f"{seed}:{kind}:{first // batch_size}")
+        rows = [make_row(rng, i) for i in range(first, min(first + batch_size, total))]
+        yield rows[max(0, start - first):]
+
+
+def user_row(password: str, created_at: datetime):
+    def make_row(rng: random.Random, i: int) -> tuple:
+        username = f"{rng.choice(FIRST_NAMES).lower()}{i}"
+        return f"user{i}@{EMAIL_DOMAIN}", username, password, True, "user", created_at
+    return make_row
+
+
+def contact_row(user_ids: list[int]):
+    def make_row(rng: random.Random, i: int) -> tuple:
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        birthday = FIRST_BIRTHDAY + timedelta(days=rng.randrange(BIRTHDAY_SPAN_DAYS))
+        return (
+            first,
+            last,
+            f"{first.lower()}.{last.lower()}.{i}@{EMAIL_DOMAIN}",
+            f"+1{rng.randrange(200, 1000)}{rng.randrange(10**7):07d}",
+            birthday,
+            birthday_key(birthday),
+            rng.choice(NOTES) if rng.random() < 0.3 else None,
+            rng.choice(user_ids),
+        )
+    return make_row
+
+
+def copy_rows(conn, table: str, columns: tuple[str, ...], rows: list[tuple]) -> None:
+    """Write `rows` with PostgreSQL ``COPY ... FROM STDIN`` (psycopg2)."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def insert_rows(conn, table: str, columns: tuple[str, ...], rows: list[tuple]) -> None:
+    """Write `rows` as one ``executemany`` INSERT."""
+    model = {"users": User, "contacts": Contact}[table]
+    conn.execute(model.__table__.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+# Maintaining the FTS5 trigram index per row dominates SQLite insert time
+FTS_INSERT_TRIGGER = next(statement for statement in SQLITE_DDL if "contacts_fts_ai" in statement)
+
+
+def suspend_search_index(engine) -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TRIGGER IF EXISTS contacts_fts_ai")
+
+
+def rebuild_search_index(engine) -> None:
+    """Re-index all contacts and restore the insert trigger (SQLite)."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+        conn.exec_driver_sql(FTS_INSERT_TRIGGER)
+
+
+def sqlite_pragmas(connection, _) -> None:
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+
+
+def seeded_count(conn, model) -> int:
+    return conn.execute(
+        select(func.count()).select_from(model).where(model.email.like(f"%@{EMAIL_DOMAIN}"))
+    ).scalar_one()
+
+
+def write(engine, table: str, columns: tuple[str, ...], rows_batches, total: int, done: int) -> None:
+    write_rows = copy_rows if engine.dialect.driver == "psycopg2" else insert_rows
+    started = time.perf_counter()
+    written = 0
+    for rows in rows_batches:
+        with engine.begin() as conn:
+            write_rows(conn, table, columns, rows)
+        written += len(rows)
+        rate = written / (time.perf_counter() - started)
+        print(f"{table}: {done + written}/{total} ({rate:,.0f} rows/s)")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Seed the database with synthetic users and contacts.")
+    parser.add_argument("--users", type=int, default=1000, help="seeded users wanted in total")
+    parser.add_argument("--contacts", type=int, default=1_000_000, help="seeded contacts wanted in total")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="rows per batch and transaction")
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed; keep it (and --batch-size) to resume")
+    parser.add_argument("--password", default="seed-password", help="password of every seeded user")
+    parser.add_argument("--database-url", default=app_settings.DATABASE_URL)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url)
+    if engine.dialect.name == "sqlite":
+        # WAL syncs only at checkpoints, and with synchronous = NORMAL a power
+        # loss can drop the last batches but never corrupt the file; resuming
+        # regenerates them. The journal mode stays WAL for later connections.
+        event.listen(engine, "connect", sqlite_pragmas)
+    if not inspect(engine).has_table("contacts"):
+        parser.error("tables not found; create the schema first (alembic upgrade head)")
+
+    try:
+        with engine.connect() as conn:
+            users_done = seeded_count(conn, User)
+        if users_done < args.users:
+            password = auth_service.pwd_context.hash(args.password)
+            rows = batches(
+                args.seed, "users", users_done, args.users, args.batch_size, user_row(password, datetime.now())
+            )
+            write(engine, "users", USER_COLUMNS, rows, args.users, users_done)
+
+        with engine.connect() as conn:
+            user_ids = list(conn.execute(
+                select(User.id).where(User.email.like(f"%@{EMAIL_DOMAIN}")).order_by(User.id)
+            ).scalars())
+            contacts_done = seeded_count(conn, Contact)
+        if contacts_done < args.contacts:
+            if not user_ids:
+                parser.error("contacts need at least one seeded user (--users)")
+            rows = batches(args.seed, "contacts", contacts_done, args.contacts, args.batch_size, contact_row(user_ids))
+            sqlite = engine.dialect.name == "sqlite"
+            if sqlite:
+                suspend_search_index(engine)
+            try:
+                write(engine, "contacts", CONTACT_COLUMNS, rows, args.contacts, contacts_done)
+            finally:
+                # Also after an interruption: the committed batches must be searchable
+                if sqlite:
+                    rebuild_search_index(engine)
+
+        # Let the planner see the new table sizes
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+    finally:
+        engine.dispose()
+    print(f"seeded users: {max(users_done, args.users)}, contacts: {max(contacts_done, args.contacts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+
+from app.conf.config import app_settings
+from app.conf.redis import redis_client
+from app.services.email import mail_dispatcher
+from app.services.jobs import Worker, job_queue
+
+"""Background job worker.
+
+Usage::
+
+    python -m app.worker
+    python -m app.worker --concurrency 16 --consumer mail-1
+
+Runs jobs enqueued by the API (see `app.services.jobs`) until SIGINT or
+SIGTERM, then finishes the running ones. Start as many workers as needed;
+they share the work through one consumer group.
+"""
+
+
+async def run(consumer: str, concurrency: int) -> None:
+    worker = Worker(
+        job_queue,
+        consumer,
+        concurrency=concurrency,
+        max_attempts=app_settings.JOBS_MAX_ATTEMPTS,
+        retry_base=app_settings.JOBS_RETRY_BASE_SECONDS,
+        claim_idle=app_settings.JOBS_CLAIM_IDLE_SECONDS,
+    )
+    # Jobs send mail directly, so a failed delivery fails (and retries) the job
+    mail_dispatcher.raise_errors = True
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await mail_dispatcher.pool.close()
+        await redis_client.aclose(close_connection_pool=True)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run background jobs from the Redis job queue.")
+    parser.add_argument("--concurrency", type=int, default=app_settings.JOBS_CONCURRENCY, help="jobs run at once")
+    parser.add_argument(
+        "--consumer", default=f"{socket.gethostname()}-{os.getpid()}", help="unique consumer name in the group"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run(args.consumer, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
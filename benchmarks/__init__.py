@@ -0,0 +1,38 @@
+import os
+
+"""Offline performance benchmarks.
+
+Run a benchmark as a module from the repository root, e.g.::
+
+    python -m benchmarks.cache_serialization
+    python -m benchmarks.contacts_serialization --limit 500
+    python -m benchmarks.compression --levels 1,4,6,9
+    python -m benchmarks.api_load --concurrency 20 --output bench.json
+"""
+
+# Placeholders for the settings the app requires; real values in the
+# environment or .env take precedence.
+PLACEHOLDER_SETTINGS = {
+    "DATABASE_URL": "sqlite:///./benchmark.db",
+    "APP_NAME": "Contacts API benchmark",
+    "SECRET_KEY": "benchmark-secret",
+    "MAIL_USERNAME": "benchmark",
+    "MAIL_PASSWORD": "benchmark",
+    "MAIL_FROM": "benchmark@example.com",
+    "MAIL_PORT": "1025",
+    "MAIL_SERVER": "localhost",
+    "MAIL_FROM_NAME": "Contacts API",
+    "MAIL_STARTTLS": "false",
+    "MAIL_SSL_TLS": "false",
+    "USE_CREDENTIALS": "false",
+    "VALIDATE_CERTS": "false",
+    "CLOUDINARY_NAME": "benchmark",
+    "CLOUDINARY_API_KEY": "benchmark",
+    "CLOUDINARY_API_SECRET": "benchmark",
+}
+
+
+def configure_environment(**overrides: str) -> None:
+    """Fill in placeholder settings so `app` can be imported offline."""
+    for name, value in {**PLACEHOLDER_SETTINGS, **overrides}.items():
+        os.environ.setdefault(name, value)
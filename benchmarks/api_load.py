@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app.tools.sample_data import FIRST_NAMES, LAST_NAMES, NOTES
+from benchmarks import configure_environment
+
+"""End-to-end load benchmark of the API, fully offline.
+
+Boots ``app.main:app`` in-process (lifespan included) behind an httpx
+ASGI transport, against stand-ins for every external service:
+
+- a temporary SQLite database, or ``--database-url`` for a disposable
+  PostgreSQL (its tables are created and dropped);
+- fakeredis for the auth cache, contacts cache, rate limiter and job queue;
+- an in-memory avatar storage backend.
+
+No scenario sends email, so there is no SMTP stand-in.
+
+Seeds ``--users`` confirmed users and ``--contacts`` contacts, then runs
+each scenario for ``--requests`` requests at ``--concurrency`` and prints
+throughput and latency percentiles as JSON. With ``--baseline`` the
+result is compared to an earlier run and the exit status is 1 if any
+scenario regressed by more than ``--max-regression``::
+
+    python -m benchmarks.api_load --output bench.json
+    python -m benchmarks.api_load --baseline bench.json
+
+Rate limiting is disabled; everything else runs as in production, so
+login pays the configured password hashing cost. Absolute numbers are
+only comparable between runs on the same machine and settings.
+"""
+
+PASSWORD = "benchmark-password"
+
+SCENARIOS = [
+    "login", "me", "list", "search", "birthdays", "create", "get", "update", "delete", "avatar", "avatar_dedup",
+]
+
+# Images the avatar_dedup scenario cycles through; all are stored after the first round
+DEDUP_IMAGES = 8
+
+
+def configure(database_url: str) -> None:
+    """Point the app at the stand-ins, overriding any real configuration."""
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "DATABASE_REPLICA_URLS": "",
+        "RATE_LIMIT_ENABLED": "false",
+    })
+    configure_environment()
+
+    import fakeredis
+    import app.conf.redis
+
+    # Every Redis user takes the shared client at import time
+    app.conf.redis.redis_client = fakeredis.aioredis.FakeRedis()
+
+
+def memory_storage():
+    """Avatar storage backend keeping objects in a dict."""
+    from app.services.upload_file import StorageBackend
+
+    class MemoryStorage(StorageBackend):
+        def __init__(self) -> None:
+            self.objects: dict[str, bytes] = {}
+
+        def save(self, key: str, data: bytes, content_type: str) -> str:
+            self.objects[key] = data
+            return self.url(key)
+
+        def exists(self, key: str) -> bool:
+            return key in self.objects
+
+        def url(self, key: str) -> str:
+            return f"memory://{key}"
+
+    return MemoryStorage()
+
+
+def sample_images(count: int, start: int = 0) -> list[bytes]:
+    """`count` distinct PNGs, image ``i`` filled with a color unique to ``i``."""
+    from PIL import Image
+
+    images = []
+    for i in range(start, start + count):
+        output = io.BytesIO()
+        Image.new("RGB", (400, 300), (i % 256, i // 256 % 256, 160)).save(output, "PNG")
+        images.append(output.getvalue())
+    return images
+
+
+def seed(users: int, contacts: int) -> None:
+    """Insert confirmed admin users sharing one password, and contacts
+    with birthdays spread over the year (some of them this week)."""
+    from sqlalchemy import insert
+
+    from app.conf.config import engine
+    from app.db import search  # noqa: F401 (creates the search index with the table)
+    from app.db.base import Base
+    from app.db.models import Contact, User, birthday_key
+    from app.services.auth import auth_service
+
+    Base.metadata.create_all(engine)
+    # One hash for everyone: seeding should not cost `users` bcrypt rounds
+    password = auth_service.pwd_context.hash(PASSWORD)
+    today = date.today()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "email": f"user{i}@bench.example.com",
+                "username": f"user{i}",
+                "password": password,
+                "confirmed": True,
+                "role": "admin",
+            }
+            for i in range(users)
+        ])
+        rows = []
+        for i in range(contacts):
+            first, last = FIRST_NAMES[i % len(FIRST_NAMES)], LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]
+            # Leap years only, so February 29 stays valid
+            birthday = (today + timedelta(days=i % 365)).replace(year=1960 + i % 10 * 4)
+            rows.append({
+                "first_name": first,
+                "last_name": last,
+                "email": f"{first.lower()}.{last.lower()}.{i}@example.com",
+                "phone": f"+1555{i:07d}",
+                "birthday": birthday,
+                "birthday_key": birthday_key(birthday),
+                "extra": NOTES[i % len(NOTES)] if i % 3 else None,
+                "user_id": 1 + i % users,
+            })
+        for start in range(0, len(rows), 1000):
+            conn.execute(insert(Contact), rows[start:start + 1000])
+
+
+def drop_schema() -> None:
+    from app.conf.config import engine
+    from app.db.base import Base
+
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+class Harness:
+    """Issues the requests of each scenario for a pool of logged-in users."""
+
+    def __init__(self, client, users: int, contacts: int, fresh_images: list[bytes]) -> None:
+        self.client = client
+        self.users = users
+        self.contacts = contacts
+        # Never uploaded before, so each avatar request thumbnails and stores
+        self.fresh_images = iter(fresh_images)
+        self.images = sample_images(DEDUP_IMAGES, start=len(fresh_images))
+        self.tokens: list[str] = []
+        self.created: list[int] = []
+
+    def email(self, i: int) -> str:
+        return f"user{i % self.users}@bench.example.com"
+
+    def auth(self, worker: int) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[worker % len(self.tokens)]}"}
+
+    async def log_in(self, count: int) -> None:
+        responses = await asyncio.gather(*(self.login(i, i) for i in range(min(count, self.users))))
+        for response in responses:
+            response.raise_for_status()
+        self.tokens = [response.json()["access_token"] for response in responses]
+
+    async def login(self, worker: int, i: int):
+        return await self.client.post("/api/v1/auth/login", data={"username": self.email(i), "password": PASSWORD})
+
+    async def me(self, worker: int, i: int):
+        return await self.client.get("/api/v1/users/me", headers=self.auth(worker))
+
+    async def list(self, worker: int, i: int):
+        params = {"limit": 50, "skip": i % 10 * 50, "sort": "last_name"}
+        return await self.client.get("/api/v1/contacts/", params=params, headers=self.auth(worker))
+
+    async def search(self, worker: int, i: int):
+        params = {"search": LAST_NAMES[i % len(LAST_NAMES)][:5].lower(), "limit": 20}
+        return await self.client.get("/api/v1/contacts/", params=params, headers=self.auth(worker))
+
+    async def birthdays(self, worker: int, i: int):
+        return await self.client.get("/api/v1/contacts/upcoming/birthdays", headers=self.auth(worker))
+
+    async def create(self, worker: int, i: int):
+        response = await self.client.post("/api/v1/contacts/", headers=self.auth(worker), json={
+            "first_name": "Bench",
+            "last_name": f"Created{i}",
+            "email": f"created.{worker}.{i}.{time.time_ns()}@example.com",
+            "phone": f"+1666{i:07d}",
+            "birthday": "1990-05-17",
+            "user_id": 1 + worker % self.users,
+        })
+        if response.status_code == 201:
+            self.created.append(response.json()["id"])
+        return response
+
+    def created_id(self, i: int) -> int:
+        return self.created[i % len(self.created)] if self.created else 1 + i % self.contacts
+
+    async def get(self, worker: int, i: int):
+        return await self.client.get(f"/api/v1/contacts/{self.created_id(i)}", headers=self.auth(worker))
+
+    async def update(self, worker: int, i: int):
+        return await self.client.put(
+            f"/api/v1/contacts/{self.created_id(i)}", headers=self.auth(worker), json={"extra": f"updated {i}"}
+        )
+
+    async def delete(self, worker: int, i: int):
+        if not self.created:
+            raise RuntimeError("delete needs contacts from the create scenario")
+        return await self.client.delete(f"/api/v1/contacts/{self.created.pop()}", headers=self.auth(worker))
+
+    async def avatar(self, worker: int, i: int):
+        files = {"file": ("avatar.png", next(self.fresh_images), "image/png")}
+        return await self.client.patch("/api/v1/users/avatar", headers=self.auth(worker), files=files)
+
+    async def avatar_dedup(self, worker: int, i: int):
+        """An image already stored: only the hash check and the user update."""
+        files = {"file": ("avatar.png", self.images[i % len(self.images)], "image/png")}
+        return await self.client.patch("/api/v1/users/avatar", headers=self.auth(worker), files=files)
+
+    async def drive(self, scenario: str, total: int, concurrency: int) -> dict:
+        """Run `total` requests of `scenario` from `concurrency` workers."""
+        call = getattr(self, scenario)
+        latencies: list[float] = []
+        errors = 0
+        # One shared iterator hands out request numbers to all workers
+        numbers = iter(range(total))
+
+        async def worker(index: int) -> None:
+            nonlocal errors
+            for i in numbers:
+                started = time.perf_counter()
+                response = await call(index, i)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            "requests": total,
+            "errors": errors,
+            "seconds": round(elapsed, 4),
+            "rps": round(total / elapsed, 1),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        }
+
+
+async def run(args) -> dict:
+    import httpx
+
+    from app.main import app
+    from app.services.upload_file import upload_service
+
+    upload_service.backend = memory_storage()
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            fresh = sample_images(args.warmup + args.requests) if "avatar" in args.scenarios else []
+            harness = Harness(client, args.users, args.contacts, fresh)
+            await harness.log_in(args.concurrency)
+            for scenario in args.scenarios:
+                if args.warmup and scenario != "delete":
+                    await harness.drive(scenario, args.warmup, args.concurrency)
+                results[scenario] = await harness.drive(scenario, args.requests, args.concurrency)
+                print(f"{scenario}: {results[scenario]}", file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> bool:
+    """Print the change against `baseline`; return True if within bounds."""
+    ok = True
+    print(f"{'scenario':12}{'rps':>10}{'base':>10}{'change':>9}{'p95 ms':>10}{'base':>10}{'change':>9}", file=sys.stderr)
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        rps_change = current["rps"] / previous["rps"] - 1
+        p95_change = current["p95_ms"] / previous["p95_ms"] - 1
+        regressed = rps_change < -max_regression or p95_change > max_regression
+        ok = ok and not regressed
+        print(
+            f"{scenario:12}{current['rps']:10.1f}{previous['rps']:10.1f}{rps_change:+9.1%}"
+            f"{current['p95_ms']:10.2f}{previous['p95_ms']:10.2f}{p95_change:+9.1%}{'  REGRESSED' if regressed else ''}",
+            file=sys.stderr,
+        )
+    return ok
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline end-to-end API load benchmark.")
+    parser.add_argument("--users", type=int, default=50, help="users to seed")
+    parser.add_argument("--contacts", type=int, default=5000, help="contacts to seed")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight")
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), type=lambda value: value.split(","),
+        help=f"comma-separated subset of {','.join(SCENARIOS)}",
+    )
+    parser.add_argument("--database-url", help="disposable PostgreSQL database (default: temporary SQLite)")
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="tolerated relative rps/p95 change")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    database_path = None
+    if args.database_url is None:
+        fd, database_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+    try:
+        configure(args.database_url or f"sqlite:///{database_path}")
+        started = time.perf_counter()
+        seed(args.users, args.contacts)
+        seed_seconds = time.perf_counter() - started
+        scenarios = asyncio.run(run(args))
+    finally:
+        if args.database_url is not None:
+            drop_schema()
+        elif database_path is not None:
+            os.unlink(database_path)
+
+    from app.conf.config import app_settings
+
+    results = {
+        "meta": {
+            "database": "postgresql" if args.database_url else "sqlite",
+            "users": args.users,
+            "contacts": args.contacts,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "password_hash_scheme": app_settings.PASSWORD_HASH_SCHEME,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "scenarios": scenarios,
+    }
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if not compare(results, baseline, args.max_regression):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import json
+import sys
+import timeit
+
+from benchmarks import configure_environment
+
+configure_environment()
+
+from app.services.cache import CachedUser
+
+"""Compare the legacy and current cached-user formats.
+
+Legacy: stdlib ``json`` dict, decoded into a class built with ``type()``.
+Current: version byte + orjson array, decoded into the slotted
+``CachedUser``. Reports encode/decode time, payload size, object size and,
+with ``--redis-url``, Redis memory per entry (``MEMORY USAGE``).
+"""
+
+SAMPLE = {
+    "id": 123456,
+    "email": "morty.smith@example.com",
+    "username": "morty",
+    "avatar": "https://res.cloudinary.com/demo/image/upload/c_fill,h_200,w_200/v1/morty/avatar.png",
+    "role": "user",
+    "confirmed": True,
+}
+
+
+def legacy_encode(user) -> str:
+    return json.dumps({name: getattr(user, name) for name in SAMPLE})
+
+
+def legacy_decode(raw: str):
+    return type("CachedUser", (), json.loads(raw))
+
+
+def per_call_ns(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e9
+
+
+async def redis_memory(url: str, entries: dict[str, bytes | str]) -> dict[str, int | None]:
+    from redis.asyncio import Redis
+    from redis.exceptions import ResponseError
+
+    client = Redis.from_url(url)
+    try:
+        usage = {}
+        for name, value in entries.items():
+            key = f"bench:cache_serialization:{name}"
+            await client.set(key, value)
+            try:
+                usage[name] = await client.memory_usage(key)
+            except ResponseError:
+                # Server without MEMORY USAGE (e.g. an in-memory stand-in)
+                usage[name] = None
+            await client.delete(key)
+        return usage
+    finally:
+        await client.aclose()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Cached-user serialization microbenchmark.")
+    parser.add_argument("--number", type=int, default=100_000, help="calls per timing run")
+    parser.add_argument("--redis-url", help="measure MEMORY USAGE per entry on this Redis")
+    args = parser.parse_args(argv)
+
+    user = CachedUser(**SAMPLE)
+    legacy_raw = legacy_encode(user)
+    current_raw = user.encode()
+
+    results = {
+        "legacy": {
+            "encode_ns": per_call_ns(lambda: legacy_encode(user), args.number),
+            "decode_ns": per_call_ns(lambda: legacy_decode(legacy_raw), args.number),
+            "payload_bytes": len(legacy_raw.encode()),
+            "object_bytes": sys.getsizeof(legacy_decode(legacy_raw)),
+        },
+        "current": {
+            "encode_ns": per_call_ns(user.encode, args.number),
+            "decode_ns": per_call_ns(lambda: CachedUser.decode(current_raw), args.number),
+            "payload_bytes": len(current_raw),
+            "object_bytes": sys.getsizeof(CachedUser.decode(current_raw)),
+        },
+    }
+    if args.redis_url:
+        usage = asyncio.run(redis_memory(args.redis_url, {"legacy": legacy_raw, "current": current_raw}))
+        for name, value in usage.items():
+            results[name]["redis_memory_bytes"] = value
+
+    print(f"{'':10}{'encode ns':>12}{'decode ns':>12}{'payload B':>12}{'object B':>12}{'redis B':>10}")
+    for name, row in results.items():
+        print(
+            f"{name:10}{row['encode_ns']:12.0f}{row['decode_ns']:12.0f}"
+            f"{row['payload_bytes']:12}{row['object_bytes']:12}{row.get('redis_memory_bytes') or '-':>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
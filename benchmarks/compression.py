@@ -0,0 +1,79 @@
+import argparse
+import random
+import timeit
+from datetime import date, timedelta
+
+import orjson
+
+from app.middleware.compression import ENCODINGS, Compressor
+from app.tools.sample_data import FIRST_NAMES, LAST_NAMES, NOTES
+
+"""CPU cost against bytes saved for each response encoding and level.
+
+Compresses a synthetic contacts list page (one JSON body, as the list
+endpoint sends it) and the same rows as NDJSON in 64 KiB chunks (as the
+streaming export sends them, flushed per chunk). Reports compressed size,
+ratio, CPU time per page and kilobytes saved per CPU millisecond.
+"""
+
+
+def sample_rows(count: int) -> list[dict]:
+    rng = random.Random(42)
+    rows = []
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        rows.append({
+            "first_name": first,
+            "last_name": last,
+            "email": f"{first.lower()}.{last.lower()}{i}@example.com",
+            "phone": f"+1{rng.randrange(10**9, 10**10)}",
+            "birthday": (date(1950, 1, 1) + timedelta(days=rng.randrange(25000))).isoformat(),
+            "extra": rng.choice([None, *NOTES]),
+            "user_id": 1,
+            "id": i + 1,
+        })
+    return rows
+
+
+def compress_whole(encoding: str, level: int, body: bytes) -> bytes:
+    compressor = Compressor(encoding, level)
+    return compressor.compress(body, flush=False) + compressor.finish()
+
+
+def compress_stream(encoding: str, level: int, chunks: list[bytes]) -> bytes:
+    compressor = Compressor(encoding, level)
+    return b"".join(compressor.compress(chunk) for chunk in chunks) + compressor.finish()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Response compression cost/benefit benchmark.")
+    parser.add_argument("--rows", type=int, default=500, help="contacts per page")
+    parser.add_argument("--levels", default="1,4,6,9", help="comma-separated levels to try")
+    parser.add_argument("--number", type=int, default=20, help="compressions per timing run")
+    args = parser.parse_args(argv)
+
+    rows = sample_rows(args.rows)
+    page = orjson.dumps(rows)
+    ndjson = b"".join(orjson.dumps(row) + b"\n" for row in rows)
+    chunks = [ndjson[i:i + 65536] for i in range(0, len(ndjson), 65536)]
+    levels = [int(level) for level in args.levels.split(",")]
+
+    print(f"identity: json page {len(page)} B, ndjson {len(ndjson)} B; encodings available: {', '.join(ENCODINGS)}")
+    print(f"{'body':8}{'encoding':10}{'level':>6}{'bytes':>10}{'ratio':>8}{'cpu ms':>9}{'KB saved/ms':>13}")
+    for label, size, run in (
+        ("json", len(page), lambda e, l: compress_whole(e, l, page)),
+        ("ndjson", len(ndjson), lambda e, l: compress_stream(e, l, chunks)),
+    ):
+        for encoding in ENCODINGS:
+            for level in levels:
+                compressed = len(run(encoding, level))
+                seconds = min(timeit.repeat(lambda: run(encoding, level), number=args.number, repeat=3)) / args.number
+                saved_kb = (size - compressed) / 1024
+                print(
+                    f"{label:8}{encoding:10}{level:6}{compressed:10}{size / compressed:8.1f}"
+                    f"{seconds * 1000:9.2f}{saved_kb / (seconds * 1000):13.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
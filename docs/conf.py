@@ -33,10 +33,10 @@ autodoc_default_options = {
 }
 
 autodoc_mock_imports = [
-    'fastapi', 'starlette', 'slowapi',
+    'fastapi', 'starlette',
     'sqlalchemy',
     'redis', 'redis.asyncio',
-    'fastapi_mail',
+    'aiosmtplib', 'jinja2',
     'cloudinary',
     'passlib',
     'jose',
@@ -0,0 +1,43 @@
+"""Contacts keyset pagination indexes
+
+Revision ID: 35d8c85f1584
+Revises: 035abc80ae27
+Create Date: 2026-10-18 10:12:41.218300
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '35d8c85f1584'
+down_revision: Union[str, Sequence[str], None] = '035abc80ae27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = (
+    ('ix_contacts_first_name_id', ['first_name', 'id']),
+    ('ix_contacts_last_name_id', ['last_name', 'id']),
+    ('ix_contacts_email_id', ['email', 'id']),
+    ('ix_contacts_birthday_id', ['birthday', 'id']),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        # Build the indexes without locking writes on large tables
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES:
+                op.create_index(name, 'contacts', columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, columns in INDEXES:
+            op.create_index(name, 'contacts', columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name='contacts')
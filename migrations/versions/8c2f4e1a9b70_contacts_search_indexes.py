@@ -0,0 +1,76 @@
+"""Contacts full-text and trigram search indexes
+
+Revision ID: 8c2f4e1a9b70
+Revises: 35d8c85f1584
+Create Date: 2026-10-18 11:03:27.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2f4e1a9b70'
+down_revision: Union[str, Sequence[str], None] = '35d8c85f1584'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(first_name, '') || ' ' || "
+    "coalesce(last_name, '') || ' ' || coalesce(email, ''))"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # Build the indexes without locking writes on large tables
+        with op.get_context().autocommit_block():
+            for name, column in (
+                ("ix_contacts_first_name_trgm", "first_name"),
+                ("ix_contacts_last_name_trgm", "last_name"),
+                ("ix_contacts_email_trgm", "email"),
+            ):
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON contacts USING gin ({column} gin_trgm_ops)")
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contacts_search_document ON contacts USING gin ({SEARCH_DOCUMENT})")
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5("
+            "first_name, last_name, email, content='contacts', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+            "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+            "VALUES (new.id, new.first_name, new.last_name, new.email); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+            "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+            "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+            "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+            "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+            "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+            "VALUES (new.id, new.first_name, new.last_name, new.email); END"
+        )
+        op.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_contacts_search_document")
+        op.execute("DROP INDEX IF EXISTS ix_contacts_email_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_contacts_last_name_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_contacts_first_name_trgm")
+    elif dialect == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS contacts_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS contacts_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS contacts_fts_ai")
+        op.execute("DROP TABLE IF EXISTS contacts_fts")
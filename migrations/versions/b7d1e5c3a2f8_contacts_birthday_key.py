@@ -0,0 +1,40 @@
+"""Contacts birthday month/day key
+
+Revision ID: b7d1e5c3a2f8
+Revises: 8c2f4e1a9b70
+Create Date: 2026-10-18 12:21:09.311874
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d1e5c3a2f8'
+down_revision: Union[str, Sequence[str], None] = '8c2f4e1a9b70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('contacts', sa.Column('birthday_key', sa.SmallInteger(), nullable=True))
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "UPDATE contacts SET birthday_key = "
+            "EXTRACT(MONTH FROM birthday)::int * 100 + EXTRACT(DAY FROM birthday)::int"
+        )
+    else:
+        op.execute(
+            "UPDATE contacts SET birthday_key = "
+            "CAST(strftime('%m', birthday) AS INTEGER) * 100 + CAST(strftime('%d', birthday) AS INTEGER)"
+        )
+    op.create_index('ix_contacts_birthday_key', 'contacts', ['birthday_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_contacts_birthday_key', table_name='contacts')
+    op.drop_column('contacts', 'birthday_key')
@@ -0,0 +1,28 @@
+"""Contacts row version
+
+Revision ID: d4a9c7e2f1b3
+Revises: b7d1e5c3a2f8
+Create Date: 2026-10-18 15:02:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a9c7e2f1b3'
+down_revision: Union[str, Sequence[str], None] = 'b7d1e5c3a2f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('contacts', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('contacts', 'version')
@@ -0,0 +1,28 @@
+"""Users avatar hash
+
+Revision ID: e1f6b2d8c4a7
+Revises: d4a9c7e2f1b3
+Create Date: 2026-10-18 17:41:09.275336
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f6b2d8c4a7'
+down_revision: Union[str, Sequence[str], None] = 'd4a9c7e2f1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('avatar_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'avatar_hash')
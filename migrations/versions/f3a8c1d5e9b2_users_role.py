@@ -0,0 +1,29 @@
+"""Users role
+
+Revision ID: f3a8c1d5e9b2
+Revises: e1f6b2d8c4a7
+Create Date: 2026-10-18 19:12:37.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8c1d5e9b2'
+down_revision: Union[str, Sequence[str], None] = 'e1f6b2d8c4a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # `User.role` was added to the model without a migration
+    op.add_column('users', sa.Column('role', sa.String(length=16), server_default='user', nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'role')
@@ -1,60 +1,78 @@
 import os
 import tempfile
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
 from app.db.base import Base
 from app.main import app
-from app.conf.config import get_db
+from app.conf.config import get_db, get_session_factory
+from app.conf.limiter import limiter
 from app.services import cache as cache_module
+from app.services.contacts_cache import contacts_cache
+from app.services.jobs import job_queue
+from app.services import auth as auth_service_module
+from app.api.v1 import auth as auth_api_module
+from app.repositories import auth as auth_repository_module
 
 @pytest.fixture(scope="session")
 def engine_and_session():
     db_fd, db_path = tempfile.mkstemp()
     os.close(db_fd)
-    url = f"sqlite:///{db_path}"
-    engine = create_engine(url)
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=create_engine(f"sqlite:///{db_path}"))
+    # NullPool: TestClient runs each request on its own event loop, so
+    # connections must not outlive the loop that opened them
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    TestingSessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
     yield engine, TestingSessionLocal
     os.unlink(db_path)
 
-@pytest.fixture()
-def db_session(engine_and_session):
+@pytest_asyncio.fixture()
+async def db_session(engine_and_session):
     _, TestingSessionLocal = engine_and_session
-    db = TestingSessionLocal()
-    try:
+    async with TestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 @pytest.fixture(autouse=True)
-def override_dependencies(db_session):
-    def _get_db():
-        try:
-            yield db_session
-        finally:
-            pass
+def override_dependencies(engine_and_session, monkeypatch):
+    _, TestingSessionLocal = engine_and_session
+
+    async def _get_db():
+        async with TestingSessionLocal() as db:
+            yield db
     app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
 
     class DummyCache:
         def __init__(self):
             self.reset_tokens: dict[str, str] = {}
-        async def set_user_for_token(self, token, user):
-            return None
+            self.local = cache_module.LocalTTLCache(maxsize=100, ttl=60)
+        async def read_stamp(self):
+            return 0
+        async def set_user_for_token(self, token, user, since=None):
+            return True
         async def get_user_by_token(self, token):
             return None
         async def set_password_reset_token(self, token: str, email: str):
             self.reset_tokens[token] = email
         async def pop_email_by_reset_token(self, token: str):
             return self.reset_tokens.pop(token, None)
+        async def invalidate_user(self, user_id: int):
+            self.local.discard_where(lambda cached: cached.id == user_id)
 
-    cache_module.cache_service = DummyCache()
+    dummy_cache = DummyCache()
+    for module in (cache_module, auth_service_module, auth_api_module, auth_repository_module):
+        monkeypatch.setattr(module, "cache_service", dummy_cache)
+    # Contacts are read straight from the database unless a test opts in
+    monkeypatch.setattr(contacts_cache, "enabled", False)
+    monkeypatch.setattr(limiter, "enabled", False)
+    monkeypatch.setattr(job_queue, "enabled", False)
     yield
     app.dependency_overrides.clear()
 
 @pytest.fixture()
 def client():
-    return TestClient(app) 
\ No newline at end of file
+    return TestClient(app)
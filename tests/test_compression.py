@@ -0,0 +1,77 @@
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.compression import CompressionMiddleware, negotiate
+
+PAGE = b"[" + b",".join(b'{"first_name":"Rick","email":"rick%d@example.com"}' % i for i in range(200)) + b"]"
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, levels={"application/json": 6, "application/x-ndjson": 1}, minimum_size=500)
+
+    @app.get("/page")
+    async def page():
+        return Response(PAGE, media_type="application/json", headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    async def small():
+        return Response(b"[]", media_type="application/json")
+
+    @app.get("/text")
+    async def text():
+        return PlainTextResponse("x" * 2000)
+
+    @app.get("/stream")
+    async def stream():
+        async def rows():
+            for i in range(100):
+                yield b'{"row": %d}\n' % i
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+def test_negotiate_honours_q_values():
+    assert negotiate("gzip, br;q=0.5", ["br", "gzip"]) == "gzip"
+    assert negotiate("br, gzip", ["br", "gzip"]) == "br"
+    assert negotiate("*;q=0.1, br;q=0", ["br", "gzip"]) == "gzip"
+    assert negotiate("identity", ["br", "gzip"]) is None
+
+
+def test_compresses_large_json_and_weakens_etag():
+    r = make_client().get("/page", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert r.headers["etag"] == 'W/"abc"'
+    assert int(r.headers["content-length"]) < len(PAGE)
+    assert r.content == PAGE
+
+
+def test_skips_small_bodies_unlisted_types_and_identity_clients():
+    client = make_client()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/text", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/page", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_streaming_responses_are_compressed_incrementally():
+    with make_client().stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as r:
+        assert r.headers["content-encoding"] == "gzip"
+        assert "content-length" not in r.headers
+        raw = b"".join(r.iter_raw())
+    # Every chunk is sync-flushed, so a prefix already decodes to whole rows
+    assert zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(raw[: len(raw) // 2]).startswith(b'{"row": 0}\n')
+    assert gzip.decompress(raw) == b"".join(b'{"row": %d}\n' % i for i in range(100))
+
+
+def test_brotli_when_installed():
+    pytest.importorskip("brotli")
+    r = make_client().get("/page", headers={"Accept-Encoding": "br"})
+    assert r.headers["content-encoding"] == "br"
+    assert r.content == PAGE
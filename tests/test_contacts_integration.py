@@ -1,3 +1,5 @@
+import base64
+import json
 from datetime import date
 from fastapi import status
 from fastapi.testclient import TestClient
@@ -59,4 +61,182 @@ def test_update_avatar_forbidden_for_non_admin(client: TestClient):
     # Try to update avatar as regular user; expect 403
     files = {"file": ("avatar.png", b"fake-bytes", "image/png")}
     r = client.patch("/api/v1/users/avatar", headers=headers, files=files)
-    assert r.status_code == status.HTTP_403_FORBIDDEN 
\ No newline at end of file
+    assert r.status_code == status.HTTP_403_FORBIDDEN 
+
+def test_contacts_cursor_pagination(client: TestClient):
+    headers = auth_header(client)
+    for i, name in enumerate(["Carl", "Anna", "Bob", "Anna", "Dave"]):
+        client.post("/api/v1/contacts/", headers=headers, json={
+            "first_name": name,
+            "last_name": "Paged",
+            "email": f"page{i}@cursor.example.com",
+            "phone": "111",
+            "birthday": date(1985, 5, i + 1).isoformat(),
+            "extra": None,
+            "user_id": 1
+        })
+
+    seen = []
+    params = {"email": "cursor.example.com", "sort": "first_name", "limit": 2}
+    while True:
+        r = client.get("/api/v1/contacts/", params=params, headers=headers)
+        assert r.status_code == status.HTTP_200_OK
+        seen.extend((c["first_name"], c["id"]) for c in r.json())
+        next_cursor = r.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params["cursor"] = next_cursor
+
+    assert seen == sorted(seen)
+    assert [name for name, _ in seen] == ["Anna", "Anna", "Bob", "Carl", "Dave"]
+
+    r = client.get("/api/v1/contacts/", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert r.status_code == status.HTTP_400_BAD_REQUEST
+    # Well-formed cursors holding a value of the wrong type for the sort column
+    for sort, value in [("first_name", ["Anna"]), ("first_name", 1), ("id", "1"), ("id", True), ("birthday", "May 1")]:
+        cursor = base64.urlsafe_b64encode(json.dumps([sort, value, 1]).encode()).decode()
+        r = client.get("/api/v1/contacts/", params={"sort": sort, "cursor": cursor}, headers=headers)
+        assert r.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_contacts_search_ranked(client: TestClient):
+    headers = auth_header(client)
+    for i, (first, last) in enumerate([("Morty", "Smith"), ("Summer", "Smithson"), ("Beth", "Mortensen")]):
+        client.post("/api/v1/contacts/", headers=headers, json={
+            "first_name": first,
+            "last_name": last,
+            "email": f"search{i}@example.com",
+            "phone": "111",
+            "birthday": date(1990, 3, i + 1).isoformat(),
+            "extra": None,
+            "user_id": 1
+        })
+
+    r = client.get("/api/v1/contacts/", params={"search": "smith"}, headers=headers)
+    assert r.status_code == status.HTTP_200_OK
+    assert {c["last_name"] for c in r.json()} == {"Smith", "Smithson"}
+
+    r = client.get("/api/v1/contacts/", params={"search": "mort"}, headers=headers)
+    assert {c["first_name"] for c in r.json()} == {"Morty", "Beth"}
+
+    r = client.get("/api/v1/contacts/", params={"search": "smith", "cursor": "x"}, headers=headers)
+    assert r.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_contacts_import_streams_csv_and_ndjson(client: TestClient):
+    headers = auth_header(client)
+    csv_body = (
+        "first_name,last_name,email,phone,birthday,extra\n"
+        "Ann,Imported,ann@import.example.com,1,1990-04-01,\n"
+        "Ben,Imported,not-an-email,2,1990-04-02,\n"
+        'Cat,Imported,cat@import.example.com,3,1990-04-03,"multi\nline"\n'
+        "Ann,Twice,ann@import.example.com,1,1990-04-01,\n"
+    )
+    r = client.post("/api/v1/contacts/import", content=csv_body,
+                    headers={**headers, "Content-Type": "text/csv"})
+    assert r.status_code == status.HTTP_200_OK
+    report = r.json()
+    assert (report["rows"], report["written"], report["skipped"], report["failed"]) == (4, 2, 1, 1)
+    assert report["errors"][0]["line"] == 3
+
+    ndjson_body = (
+        '{"first_name": "Ann", "last_name": "Updated", "email": "ann@import.example.com", '
+        '"phone": "9", "birthday": "1990-04-01"}\n'
+        "[1, 2]\n"
+    )
+    r = client.post("/api/v1/contacts/import", params={"on_conflict": "update"}, content=ndjson_body,
+                    headers={**headers, "Content-Type": "application/x-ndjson"})
+    report = r.json()
+    assert (report["written"], report["failed"]) == (1, 1)
+
+    r = client.get("/api/v1/contacts/", params={"email": "import.example.com"}, headers=headers)
+    by_email = {c["email"]: c for c in r.json()}
+    assert by_email["ann@import.example.com"]["last_name"] == "Updated"
+    assert by_email["cat@import.example.com"]["extra"] == "multi\nline"
+
+    r = client.post("/api/v1/contacts/import", content="{}", headers={**headers, "Content-Type": "application/json"})
+    assert r.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+
+def test_contacts_export_streams_all_matches(client: TestClient):
+    headers = auth_header(client)
+    for i in range(3):
+        client.post("/api/v1/contacts/", headers=headers, json={
+            "first_name": f"Exp{i}", "last_name": "Ported", "email": f"e{i}@export.example.com",
+            "phone": "1", "birthday": "1990-01-01", "extra": None, "user_id": 1,
+        })
+
+    r = client.get("/api/v1/contacts/export", params={"email": "export.example.com"}, headers=headers)
+    assert r.status_code == status.HTTP_200_OK
+    assert r.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert [c["first_name"] for c in lines] == ["Exp0", "Exp1", "Exp2"]
+    assert lines[0]["birthday"] == "1990-01-01"
+
+    r = client.get("/api/v1/contacts/export", params={"email": "export.example.com", "format": "csv"}, headers=headers)
+    rows = r.text.splitlines()
+    assert rows[0] == "id,first_name,last_name,email,phone,birthday,extra,user_id"
+    assert len(rows) == 4
+
+
+def test_contacts_bulk_update_and_delete(client: TestClient):
+    headers = auth_header(client)
+    ids = []
+    for i in range(4):
+        r = client.post("/api/v1/contacts/", headers=headers, json={
+            "first_name": f"Bulk{i}", "last_name": "Stale", "email": f"b{i}@bulk.example.com",
+            "phone": "1", "birthday": "1990-01-01", "extra": None, "user_id": 1,
+        })
+        ids.append(r.json()["id"])
+
+    r = client.patch("/api/v1/contacts/bulk", headers=headers,
+                     json={"ids": ids[:2], "changes": {"phone": "42", "birthday": "1990-06-15"}})
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json() == {"affected": 2, "ids": ids[:2]}
+    assert client.get(f"/api/v1/contacts/{ids[0]}", headers=headers).json()["phone"] == "42"
+
+    # Required fields cannot be cleared; only extra is nullable
+    r = client.patch("/api/v1/contacts/bulk", headers=headers, json={"ids": ids[:2], "changes": {"first_name": None}})
+    assert r.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert "first_name" in r.text
+    r = client.patch("/api/v1/contacts/bulk", headers=headers, json={"ids": ids[:2], "changes": {"extra": None}})
+    assert r.status_code == status.HTTP_200_OK
+
+    # A selector is mandatory, so an empty filter set cannot hit every contact
+    r = client.request("DELETE", "/api/v1/contacts/bulk", headers=headers, json={"filters": {}})
+    assert r.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    r = client.request("DELETE", "/api/v1/contacts/bulk", headers=headers,
+                       json={"filters": {"email": "bulk.example.com"}})
+    assert r.json()["affected"] == 4
+    assert client.get(f"/api/v1/contacts/{ids[3]}", headers=headers).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_conditional_get_with_etags(client: TestClient):
+    headers = auth_header(client)
+    r = client.post("/api/v1/contacts/", headers=headers, json={
+        "first_name": "Etag", "last_name": "Polled", "email": "poll@etag.example.com",
+        "phone": "1", "birthday": "1990-01-01", "extra": None, "user_id": 1,
+    })
+    url = f"/api/v1/contacts/{r.json()['id']}"
+
+    r = client.get(url, headers=headers)
+    etag = r.headers["ETag"]
+    r = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert r.status_code == status.HTTP_304_NOT_MODIFIED
+    assert r.content == b""
+
+    # Every write bumps the row version and therefore the ETag
+    client.put(url, json={"phone": "2"}, headers=headers)
+    r = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert r.status_code == status.HTTP_200_OK
+    assert r.headers["ETag"] != etag
+
+    r = client.get("/api/v1/contacts/", params={"email": "etag.example.com"}, headers=headers)
+    r = client.get("/api/v1/contacts/", params={"email": "etag.example.com"},
+                   headers={**headers, "If-None-Match": r.headers["ETag"]})
+    assert r.status_code == status.HTTP_304_NOT_MODIFIED
+
+    r = client.get("/api/v1/users/me", headers=headers)
+    r = client.get("/api/v1/users/me", headers={**headers, "If-None-Match": r.headers["ETag"]})
+    assert r.status_code == status.HTTP_304_NOT_MODIFIED
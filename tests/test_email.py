@@ -0,0 +1,102 @@
+import asyncio
+import socket
+
+import aiosmtplib
+import pytest
+
+from app.services.email import MailDispatcher, OutgoingMail, SMTPPool, build_message
+from app.services.metrics import metrics
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture()
+def smtp_sink():
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+
+    class Sink:
+        def __init__(self):
+            self.messages = []
+            self.sessions = set()
+
+        async def handle_DATA(self, server, session, envelope):
+            self.sessions.add(id(session))
+            self.messages.append(envelope)
+            return "250 OK"
+
+    sink = Sink()
+    controller = controller_module.Controller(sink, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield sink, controller.port
+    controller.stop()
+
+
+def test_build_message_renders_cached_template():
+    message = build_message("rick@example.com", "Verify your email", "verify_email.html",
+                            {"host": "http://test/", "username": "Rick", "token": "t0k"})
+    body = message.get_content()
+    assert "Hi Rick" in body and "http://test/api/v1/auth/confirmed_email/t0k" in body
+    assert message["To"] == "rick@example.com"
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_batches_over_pooled_connections(smtp_sink):
+    sink, port = smtp_sink
+    dispatcher = MailDispatcher(SMTPPool("127.0.0.1", port, size=2), batch_size=10)
+    dispatcher.start()
+    for i in range(25):
+        await dispatcher.send(build_message(f"user{i}@example.com", "Hi", "verify_email.html",
+                                            {"host": "h/", "username": "u", "token": "t"}))
+    await dispatcher.stop()
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in sink.messages) == sorted(f"user{i}@example.com" for i in range(25))
+    # Two pooled connections served every message
+    assert len(sink.sessions) <= 2
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_retries_then_gives_up():
+    dispatcher = MailDispatcher(SMTPPool("127.0.0.1", free_port(), size=1, timeout=1), max_attempts=2, retry_base=0.01)
+    dispatcher.start()
+    await dispatcher.send(build_message("x@example.com", "Hi", "verify_email.html", {}))
+    await asyncio.wait_for(dispatcher.queue.join(), 5)
+    assert metrics.counters["mail_failed"] >= 1
+    await dispatcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_pool_reconnects_once_on_a_stale_connection(smtp_sink):
+    sink, port = smtp_sink
+    pool = SMTPPool("127.0.0.1", port, size=1)
+    message = build_message("x@example.com", "Hi", "verify_email.html", {})
+    assert await pool.send([message]) == [None]
+
+    async def disconnected(message):
+        raise aiosmtplib.SMTPServerDisconnected("Connection closed by the server")
+
+    pool._idle[0].send_message = disconnected
+    assert await pool.send([message, message]) == [None, None]
+    assert len(sink.messages) == 3
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_retry_into_full_queue_counts_as_failed():
+    dispatcher = MailDispatcher(SMTPPool("127.0.0.1", free_port()), queue_size=1, retry_base=0)
+    dispatcher.queue = asyncio.Queue(1)
+    failing = OutgoingMail(build_message("x@example.com", "Hi", "verify_email.html", {}))
+    failing.attempts = 1
+    dispatcher.queue.put_nowait(failing)
+    dispatcher.queue.get_nowait()
+    dispatcher.queue.put_nowait(OutgoingMail(build_message("y@example.com", "Hi", "verify_email.html", {})))
+    failed = metrics.counters["mail_failed"]
+
+    await dispatcher._retry_later(failing)
+    assert metrics.counters["mail_failed"] == failed + 1
+    dispatcher.queue.get_nowait()
+    dispatcher.queue.task_done()
+    await asyncio.wait_for(dispatcher.queue.join(), 1)
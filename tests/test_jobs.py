@@ -0,0 +1,80 @@
+import orjson
+import pytest
+
+from app.services.jobs import REDACTED, JobQueue, Worker
+
+
+@pytest.fixture()
+def queue():
+    fakeredis = pytest.importorskip("fakeredis")
+    queue = JobQueue(fakeredis.aioredis.FakeRedis())
+    queue.enabled = True
+    return queue
+
+
+@pytest.mark.asyncio
+async def test_job_runs_once_and_is_acknowledged(queue):
+    calls = []
+
+    @queue.job("greet")
+    async def greet(name: str):
+        calls.append(name)
+
+    worker = Worker(queue, "w1")
+    await worker.ensure_group()
+    assert await queue.enqueue("greet", name="Rick")
+
+    entries = await worker.read(10, block_ms=10)
+    assert len(entries) == 1
+    await worker.process(*entries[0])
+
+    assert calls == ["Rick"]
+    assert (await queue.client.xpending(queue.stream, queue.group))["pending"] == 0
+    assert await worker.read(10, block_ms=10) == []
+
+
+@pytest.mark.asyncio
+async def test_failing_job_is_retried_then_dead_lettered(queue):
+    attempts = []
+
+    @queue.job("flaky")
+    async def flaky():
+        attempts.append(1)
+        raise RuntimeError("smtp down")
+
+    worker = Worker(queue, "w1", max_attempts=2, retry_base=0)
+    await worker.ensure_group()
+    await queue.enqueue("flaky")
+
+    await worker.process(*(await worker.read(1, block_ms=10))[0])
+    for retry in list(worker._retries):
+        await retry
+    retried = await worker.read(1, block_ms=10)
+    assert retried[0][1][b"attempts"] == b"1"
+    await worker.process(*retried[0])
+
+    assert len(attempts) == 2
+    dead = await queue.client.xrange(queue.dead_letter_stream)
+    assert len(dead) == 1 and b"smtp down" in dead[0][1][b"error"]
+    assert (await queue.client.xpending(queue.stream, queue.group))["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_dead_letter_redacts_secret_payload_fields(queue):
+    @queue.job("reset", secrets=("token",))
+    async def reset(email: str, token: str):
+        raise RuntimeError("smtp down")
+
+    worker = Worker(queue, "w1", max_attempts=1)
+    await worker.ensure_group()
+    await queue.enqueue("reset", email="rick@example.com", token="s3cret")
+    await worker.process(*(await worker.read(1, block_ms=10))[0])
+
+    (_, fields), = await queue.client.xrange(queue.dead_letter_stream)
+    assert orjson.loads(fields[b"payload"]) == {"email": "rick@example.com", "token": REDACTED}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_reports_disabled_queue(queue):
+    queue.enabled = False
+    assert not await queue.enqueue("greet", name="Rick")
@@ -0,0 +1,58 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app.conf.config import app_settings
+from app.conf.limiter import RateLimiter, RateLimitHeadersMiddleware, RateLimitPolicy
+from app.main import rate_limit_handler, RateLimitExceeded
+
+
+@pytest.fixture()
+def limiter():
+    fakeredis = pytest.importorskip("fakeredis")
+    limiter = RateLimiter(fakeredis.aioredis.FakeRedis())
+    limiter.enabled = True
+    return limiter
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_is_shared_and_leased(limiter):
+    policy = RateLimitPolicy("test", "20/minute")
+    states = [await limiter.hit(policy, "user:a") for _ in range(21)]
+
+    assert all(state.allowed for state in states[:20])
+    assert [state.remaining for state in states[:3]] == [19, 18, 17]
+    assert not states[20].allowed and states[20].retry_after > 0
+    # Other callers have their own bucket
+    assert (await limiter.hit(policy, "user:b")).allowed
+
+    # A second worker sharing Redis sees the same exhausted bucket
+    other_worker = RateLimiter(limiter.client)
+    assert not (await other_worker.hit(policy, "user:a")).allowed
+
+
+def test_limit_dependency_keys_by_subject_and_sets_headers(limiter):
+    limiter.policies["me"] = RateLimitPolicy("me", "2/minute")
+    app = FastAPI()
+    app.add_middleware(RateLimitHeadersMiddleware)
+    app.add_exception_handler(RateLimitExceeded, rate_limit_handler)
+
+    @app.get("/me", dependencies=[Depends(limiter.limit("me"))])
+    async def me():
+        return {"ok": True}
+
+    client = TestClient(app)
+    token = jwt.encode({"sub": "rick@example.com"}, app_settings.SECRET_KEY)
+    auth = {"Authorization": f"Bearer {token}"}
+
+    r = client.get("/me", headers=auth)
+    assert (r.headers["ratelimit-limit"], r.headers["ratelimit-remaining"]) == ("2", "1")
+    client.get("/me", headers=auth)
+    r = client.get("/me", headers=auth)
+    assert r.status_code == 429
+    assert r.json() == {"error": "Limit exceeded."}
+    assert int(r.headers["retry-after"]) >= 1
+
+    # Same address, no token: a separate, IP-keyed bucket
+    assert client.get("/me").status_code == 200
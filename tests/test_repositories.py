@@ -1,11 +1,19 @@
 from datetime import date
-from app.repositories.contacts import contacts_repository
+
+import pytest
+from pydantic import TypeAdapter
+from sqlalchemy import event, text
+
+from app.api.v1.contacts import render_rows
+from app.db.models import Contact
+from app.repositories.contacts import READ_COLUMNS, contacts_repository
 from app.repositories.auth import auth_repository
-from app.schemas.contacts import ContactCreate, ContactUpdate
+from app.schemas.contacts import ContactCreate, ContactRead, ContactUpdate
 from app.schemas.users import UserRegisterSchema
 
 
-def test_create_and_get_contact(db_session):
+@pytest.mark.asyncio
+async def test_create_and_get_contact(db_session):
     payload = ContactCreate(
         first_name="John",
         last_name="Doe",
@@ -15,14 +23,15 @@ def test_create_and_get_contact(db_session):
         user_id=1,
         extra=None,
     )
-    obj = contacts_repository.create_contact(db_session, payload)
-    fetched = contacts_repository.get_contact(db_session, obj.id)
+    obj = await contacts_repository.create_contact(db_session, payload)
+    fetched = await contacts_repository.get_contact(db_session, obj.id)
     assert fetched.id == obj.id
     assert fetched.email == "john@example.com"
 
 
-def test_update_and_delete_contact(db_session):
-    obj = contacts_repository.create_contact(db_session, ContactCreate(
+@pytest.mark.asyncio
+async def test_update_and_delete_contact(db_session):
+    obj = await contacts_repository.create_contact(db_session, ContactCreate(
         first_name="Jane",
         last_name="Doe",
         email="jane@example.com",
@@ -32,15 +41,16 @@ def test_update_and_delete_contact(db_session):
         extra=None,
     ))
 
-    updated = contacts_repository.update_contact(db_session, obj.id, ContactUpdate(phone="0000"))
+    updated = await contacts_repository.update_contact(db_session, obj.id, ContactUpdate(phone="0000"))
     assert updated.phone == "0000"
 
-    ok = contacts_repository.delete_contact(db_session, obj.id)
+    ok = await contacts_repository.delete_contact(db_session, obj.id)
     assert ok is True
-    assert contacts_repository.get_contact(db_session, obj.id) is None
+    assert await contacts_repository.get_contact(db_session, obj.id) is None
 
 
-def test_user_repository_create_and_get(db_session):
+@pytest.mark.asyncio
+async def test_user_repository_create_and_get(db_session):
     body = UserRegisterSchema(
         id=0,
         username="tester",
@@ -49,9 +59,84 @@ def test_user_repository_create_and_get(db_session):
         password="secret12345",
         role="admin"
     )
-    user = db_session.execute("""INSERT INTO users (email, username, password, confirmed, role) VALUES (:email, :username, :password, 1, :role) RETURNING id""",
-                              {"email": body.email, "username": body.username, "password": body.password, "role": body.role}).scalar()
+    result = await db_session.execute(text("""INSERT INTO users (email, username, password, confirmed, role) VALUES (:email, :username, :password, 1, :role) RETURNING id"""),
+                                      {"email": body.email, "username": body.username, "password": body.password, "role": body.role})
+    user = result.scalar()
     assert user is not None
 
-    fetched = auth_repository.get_user_by_email  # ensure method exists
-    assert callable(fetched) 
\ No newline at end of file
+    fetched = await auth_repository.get_user_by_email(body.email, db_session)
+    assert fetched is not None and fetched.username == "tester"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("today, days, expected", [
+    (date(2025, 12, 28), 7, ["Dec 30", "Jan 2"]),
+    (date(2025, 2, 25), 3, ["Feb 28", "Feb 29"]),
+    (date(2024, 2, 25), 3, ["Feb 28"]),
+    (date(2025, 3, 1), 1, []),
+    # A full-year window lists everyone, starting from the next birthday
+    (date(2025, 6, 1), 366, ["Dec 30", "Jan 2", "Feb 28", "Feb 29"]),
+])
+async def test_upcoming_birthdays_window(db_session, today, days, expected):
+    for name, birthday in [("Dec 30", date(1980, 12, 30)), ("Jan 2", date(1981, 1, 2)),
+                           ("Feb 28", date(1982, 2, 28)), ("Feb 29", date(1984, 2, 29))]:
+        email = f"bday-{birthday.isoformat()}@example.com"
+        if not (await contacts_repository.list_contacts(db_session, email=email)):
+            await contacts_repository.create_contact(db_session, ContactCreate(
+                first_name=name, last_name="Birthday", email=email,
+                phone="1", birthday=birthday, user_id=1, extra=None,
+            ))
+
+    contacts = await contacts_repository.upcoming_birthdays(db_session, days, today=today)
+    assert [c.first_name for c in contacts if c.last_name == "Birthday"] == expected
+
+
+@pytest.mark.asyncio
+async def test_projected_rows_render_like_contact_read(db_session):
+    await contacts_repository.create_contact(db_session, ContactCreate(
+        first_name="Projected", last_name="Row", email="projected@rows.example.com",
+        phone="1", birthday=date(1990, 3, 4), user_id=1, extra=None,
+    ))
+    entities = await contacts_repository.list_contacts(db_session, search="Projected")
+    rows = await contacts_repository.list_contacts(db_session, search="Projected", columns=READ_COLUMNS)
+
+    adapter = TypeAdapter(list[ContactRead])
+    assert render_rows(rows) == adapter.dump_json(adapter.validate_python(entities, from_attributes=True))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_updates_last_write_wins(engine_and_session):
+    _, session_factory = engine_and_session
+    async with session_factory() as db:
+        obj = await contacts_repository.create_contact(db, ContactCreate(
+            first_name="Race", last_name="Doe", email="race@example.com", phone="1", birthday=date(1990, 3, 3), user_id=1,
+        ))
+    async with session_factory() as first, session_factory() as second:
+        # Both sessions hold the same row version before either writes
+        await first.get(Contact, obj.id)
+        await second.get(Contact, obj.id)
+        await contacts_repository.update_contact(first, obj.id, ContactUpdate(phone="2"))
+        updated = await contacts_repository.update_contact(second, obj.id, ContactUpdate(phone="3"))
+    assert (updated.phone, updated.version) == ("3", obj.version + 2)
+
+
+@pytest.mark.asyncio
+async def test_upsert_splits_batches_over_the_parameter_limit(db_session, monkeypatch):
+    # Nine columns per row: three rows per statement
+    monkeypatch.setattr("app.repositories.contacts.MAX_BIND_PARAMETERS", 30)
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db_session.bind.sync_engine, "before_cursor_execute", listener)
+    contacts = [
+        ContactCreate(first_name="Bulk", last_name=f"Row{i}", email=f"bulk{i}@example.com", phone="1",
+                      birthday=date(1990, 1, 1), user_id=1, extra=None)
+        for i in range(10)
+    ]
+    try:
+        assert await contacts_repository.upsert_contacts(db_session, contacts) == 10
+        assert await contacts_repository.upsert_contacts(db_session, contacts, "update") == 10
+    finally:
+        event.remove(db_session.bind.sync_engine, "before_cursor_execute", listener)
+    assert sum(statement.startswith("INSERT") for statement in statements) == 8
+    count = await db_session.execute(text("SELECT count(*) FROM contacts WHERE email LIKE 'bulk%'"))
+    assert count.scalar() == 10
@@ -0,0 +1,96 @@
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db.base import Base
+from app.db.models import User
+from app.db.routing import ReplicaSet, RoutingAsyncSession, RoutingSession
+
+
+def _database(username: str):
+    db_fd, db_path = tempfile.mkstemp()
+    os.close(db_fd)
+    sync_engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as conn:
+        conn.execute(User.__table__.insert().values(email="u@example.com", username=username, password="secret12345"))
+    return db_path, create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+
+
+@pytest.fixture()
+def routed_sessions():
+    primary_path, primary = _database("primary")
+    replica_path, replica = _database("replica")
+    broken = create_async_engine("sqlite+aiosqlite:////nonexistent/dir/db.sqlite", poolclass=NullPool)
+    replicas = ReplicaSet([broken, replica], retry_after=60)
+    factory = async_sessionmaker(
+        primary,
+        class_=RoutingAsyncSession,
+        sync_session_class=RoutingSession,
+        expire_on_commit=False,
+        info={"replicas": replicas},
+    )
+    yield factory, replicas, broken
+    os.unlink(primary_path)
+    os.unlink(replica_path)
+
+
+async def _username(db, **options):
+    result = await db.execute(select(User.username).execution_options(**options))
+    return result.scalar()
+
+
+@pytest.mark.asyncio
+async def test_reads_fall_back_and_writes_pin_to_primary(routed_sessions):
+    factory, replicas, broken = routed_sessions
+    async with factory() as db:
+        # Plain reads stay on the primary
+        assert await _username(db) == "primary"
+        # The broken replica is taken out of rotation and the read retried on the primary
+        assert await _username(db, read_replica=True) == "primary"
+        assert not replicas.is_healthy(broken)
+        # The next opted-in read goes to the healthy replica
+        assert await _username(db, read_replica=True) == "replica"
+
+        db.add(User(email="new@example.com", username="new", password="secret12345"))
+        await db.flush()
+        # After a write the session reads its own writes from the primary
+        result = await db.execute(select(User.username).where(User.email == "new@example.com").execution_options(read_replica=True))
+        assert result.scalar() == "new"
+
+
+@pytest.mark.asyncio
+async def test_refused_replica_connection_falls_back_to_primary(routed_sessions):
+    factory, _, _ = routed_sessions
+    # asyncpg raises ConnectionRefusedError (an OSError) unwrapped
+    refused = create_async_engine("postgresql+asyncpg://u:p@127.0.0.1:1/db", poolclass=NullPool)
+    replicas = ReplicaSet([refused], retry_after=60)
+    async with factory(info={"replicas": replicas}) as db:
+        assert await _username(db, read_replica=True) == "primary"
+    assert not replicas.is_healthy(refused)
+
+
+@pytest.mark.asyncio
+async def test_statement_errors_do_not_take_a_replica_down(routed_sessions):
+    factory, replicas, broken = routed_sessions
+    replicas.mark_down(broken)
+    _, healthy = replicas.engines
+    async with factory() as db:
+        # An unbindable parameter fails on any server; it is not retried on the primary
+        with pytest.raises(ProgrammingError):
+            await db.execute(text("SELECT :value").bindparams(value=[1]).execution_options(read_replica=True))
+    assert replicas.is_healthy(healthy)
+
+
+@pytest.mark.asyncio
+async def test_streamed_reads_fall_back_to_primary(routed_sessions):
+    factory, replicas, broken = routed_sessions
+    async with factory() as db:
+        result = await db.stream(select(User.username).execution_options(read_replica=True))
+        assert [row.username async for row in result] == ["primary"]
+    assert not replicas.is_healthy(broken)
@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine, select
+
+from app.db.base import Base
+from app.db.models import Contact, User, birthday_key
+from app.tools import seed
+
+
+def seeded(url: str) -> list[tuple]:
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        rows = conn.execute(select(*(getattr(Contact, column) for column in seed.CONTACT_COLUMNS)).order_by(Contact.id)).all()
+    engine.dispose()
+    return rows
+
+
+def test_seed_is_deterministic_and_resumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(seed.auth_service.pwd_context, "hash", lambda password: "x" * 60)
+    urls = [f"sqlite:///{tmp_path / name}.db" for name in ("full", "resumed")]
+    for url in urls:
+        Base.metadata.create_all(create_engine(url))
+    options = ["--users", "7", "--batch-size", "40", "--seed", "3"]
+
+    seed.main([*options, "--database-url", urls[0], "--contacts", "130"])
+    # Interrupted mid-batch, then resumed to the same total
+    seed.main([*options, "--database-url", urls[1], "--contacts", "55"])
+    seed.main([*options, "--database-url", urls[1], "--contacts", "130"])
+    seed.main([*options, "--database-url", urls[1], "--contacts", "130"])
+
+    full, resumed = seeded(urls[0]), seeded(urls[1])
+    assert len(full) == 130
+    assert full == resumed
+    assert all(row.birthday_key == birthday_key(row.birthday) for row in full)
+    engine = create_engine(urls[1])
+    with engine.connect() as conn:
+        assert len(conn.execute(select(User.id)).all()) == 7
+    engine.dispose()
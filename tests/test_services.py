@@ -0,0 +1,180 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.cache import CachedUser, CacheService, LocalTTLCache
+from app.services.contacts_cache import ContactsCache
+from app.services.metrics import metrics
+from app.services.password_hasher import PasswordHasherPool, create_password_context
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_pool_caps_queue():
+    pool = PasswordHasherPool(max_workers=1, max_queue=1)
+
+    def slow(value):
+        time.sleep(0.05)
+        return value * 2
+
+    results = await asyncio.gather(*(pool.run(slow, i) for i in range(3)), return_exceptions=True)
+
+    assert results[:2] == [0, 2]
+    assert isinstance(results[2], HTTPException) and results[2].status_code == 503
+    wait = metrics.snapshot()["timings"]["password_hash_queue_wait_seconds"]
+    # The second call queued behind the first one
+    assert wait["max"] >= 0.04
+
+
+def test_password_context_flags_outdated_hashes_for_rehash():
+    legacy = create_password_context("bcrypt", bcrypt_rounds=4).hash("secret12345")
+
+    current = create_password_context("argon2", argon2_time_cost=1, argon2_memory_cost=1024, argon2_parallelism=1)
+    valid, new_hash = current.verify_and_update("secret12345", legacy)
+    assert valid and new_hash.startswith("$argon2id$")
+
+    # An up-to-date hash verifies without a replacement
+    assert current.verify_and_update("secret12345", new_hash) == (True, None)
+    assert current.verify_and_update("wrong-password", legacy) == (False, None)
+
+
+def test_local_ttl_cache_expiry_and_eviction():
+    cache = LocalTTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now the most recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None and len(cache) == 2
+
+    # An entry never outlives the deadline it was stored with
+    cache.set("expired", 4, expires_at=time.time() - 1)
+    assert cache.get("expired") is None
+
+
+def test_cached_user_binary_roundtrip():
+    user = CachedUser(7, "u@example.com", "u", None, "admin", True)
+    decoded = CachedUser.decode(user.encode())
+    assert (decoded.id, decoded.email, decoded.avatar, decoded.role, decoded.confirmed) == (7, "u@example.com", None, "admin", True)
+    assert not hasattr(decoded, "__dict__")
+
+    # Entries in the legacy JSON format (or a future version) are cache misses
+    assert CachedUser.decode(b'{"id": 7}') is None
+    assert CachedUser.decode(b"\x63[]") is None
+
+
+@pytest.mark.asyncio
+async def test_cache_service_bulk_operations():
+    fakeredis = pytest.importorskip("fakeredis")
+    service = CacheService(fakeredis.aioredis.FakeRedis())
+    users = [CachedUser(i, f"u{i}@example.com", f"u{i}", None, "user", True) for i in (1, 2)]
+
+    await service.set_users_for_tokens([("t1", users[0]), ("t2", users[1])])
+    found = await service.get_users_by_tokens(["t1", "missing", "t2"])
+
+    assert [user.id if user else None for user in found] == [1, None, 2]
+    assert (await service.get_user_by_token("t2")).email == "u2@example.com"
+
+    # Invalidation is one delete per user, whatever the number of tokens
+    service.local.set("t1", users[0])
+    await service.invalidate_user(1)
+    assert await service.get_user_by_token("t1") is None
+    assert service.local.get("t1") is None
+    assert (await service.get_user_by_token("t2")).id == 2
+
+    await service.set_password_reset_token("reset", "u1@example.com")
+    assert await service.pop_email_by_reset_token("reset") == "u1@example.com"
+    assert await service.pop_email_by_reset_token("reset") is None
+
+
+@pytest.mark.asyncio
+async def test_cache_fill_read_before_invalidation_is_not_stored():
+    fakeredis = pytest.importorskip("fakeredis")
+    service = CacheService(fakeredis.aioredis.FakeRedis())
+    user = CachedUser(1, "u1@example.com", "u1", None, "user", False)
+
+    since = await service.read_stamp()
+    # The user changes and is invalidated while the fill reads the old row
+    await service.invalidate_user(1)
+    assert not await service.set_user_for_token("t1", user, since)
+    assert await service.get_user_by_token("t1") is None
+
+    # A fill that read after the change is stored
+    assert await service.set_user_for_token("t1", user, await service.read_stamp())
+    assert (await service.get_user_by_token("t1")).id == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_user_survives_redis_errors():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    server.connected = False
+    service = CacheService(fakeredis.aioredis.FakeRedis(server=server))
+    service.local.set("t1", CachedUser(1, "u1@example.com", "u1", None, "user", True))
+
+    await service.invalidate_user(1)
+    assert service.local.get("t1") is None
+
+
+@pytest.mark.asyncio
+async def test_contacts_cache_read_through_and_invalidate():
+    fakeredis = pytest.importorskip("fakeredis")
+    cache = ContactsCache(fakeredis.aioredis.FakeRedis())
+    cache.enabled = True
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return b'[{"id": 1}]', {"X-Next-Cursor": "abc"}
+
+    params = {"search": None, "limit": 10}
+    first = await cache.read_through("list", params, 60, load)
+    second = await cache.read_through("list", params, 60, load)
+    assert first == second == (b'[{"id": 1}]', {"X-Next-Cursor": "abc"})
+    assert len(loads) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # A write retires every entry at once
+    await cache.invalidate()
+    await cache.read_through("list", params, 60, load)
+    assert len(loads) == 2
+
+
+@pytest.mark.asyncio
+async def test_contacts_cache_content_etag_skips_loading():
+    fakeredis = pytest.importorskip("fakeredis")
+    cache = ContactsCache(fakeredis.aioredis.FakeRedis())
+    cache.enabled = True
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return b"[]", {}
+
+    _, headers = await cache.read_through("list", {}, 60, load, content_etag=True)
+    body, _ = await cache.read_through("list", {}, 60, load, if_none_match=headers["ETag"], content_etag=True)
+    assert body is None and len(loads) == 1
+
+    await cache.invalidate()
+    body, _ = await cache.read_through("list", {}, 60, load, if_none_match=headers["ETag"], content_etag=True)
+    assert body == b"[]" and len(loads) == 2
+
+
+@pytest.mark.asyncio
+async def test_contacts_cache_etag_changes_after_lost_invalidation_expires():
+    fakeredis = pytest.importorskip("fakeredis")
+    cache = ContactsCache(fakeredis.aioredis.FakeRedis())
+    cache.enabled = True
+    rows = [b"[]"]
+
+    async def load():
+        return rows[0], {}
+
+    _, headers = await cache.read_through("list", {}, 60, load, content_etag=True)
+    # A write whose version bump failed, then the entry's TTL runs out
+    rows[0] = b'[{"id": 1}]'
+    for key in await cache.client.keys("contacts:v0:*"):
+        await cache.client.delete(key)
+
+    body, fresh = await cache.read_through("list", {}, 60, load, if_none_match=headers["ETag"], content_etag=True)
+    assert body == b'[{"id": 1}]' and fresh["ETag"] != headers["ETag"]
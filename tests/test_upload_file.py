@@ -0,0 +1,90 @@
+import io
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from app.services.upload_file import CloudinaryStorage, LocalStorage, UploadFileService, avatar_key, make_thumbnail
+
+
+def image_bytes(size=(640, 480), fmt="PNG", mode="RGB") -> bytes:
+    output = io.BytesIO()
+    Image.new(mode, size, "red").save(output, fmt)
+    return output.getvalue()
+
+
+def test_thumbnail_is_center_cropped_to_avatar_size():
+    for fmt, mode in (("PNG", "RGB"), ("JPEG", "RGB"), ("GIF", "P"), ("PNG", "LA")):
+        with Image.open(io.BytesIO(make_thumbnail(image_bytes(fmt=fmt, mode=mode)))) as thumbnail:
+            assert thumbnail.size == (200, 200)
+            assert thumbnail.format == "WEBP"
+    with pytest.raises(ValueError):
+        make_thumbnail(b"not an image")
+
+
+@pytest.mark.asyncio
+async def test_upload_avatar_stores_thumbnail_locally(tmp_path):
+    service = UploadFileService(LocalStorage(tmp_path, "/media/"), max_bytes=1024 * 1024)
+
+    url, digest = await service.upload_avatar(UploadFile(io.BytesIO(image_bytes())), None)
+
+    assert url == f"/media/{avatar_key(digest)}"
+    with Image.open(tmp_path / avatar_key(digest)) as stored:
+        assert stored.size == (200, 200)
+
+
+@pytest.mark.asyncio
+async def test_identical_uploads_are_not_processed_again(tmp_path, monkeypatch):
+    service = UploadFileService(LocalStorage(tmp_path, "/media"), max_bytes=1024 * 1024)
+    url, digest = await service.upload_avatar(UploadFile(io.BytesIO(image_bytes())), None)
+
+    def fail(*args):
+        raise AssertionError("thumbnail rebuilt")
+    monkeypatch.setattr("app.services.upload_file.make_thumbnail", fail)
+
+    # The current avatar again: nothing to do
+    assert await service.upload_avatar(UploadFile(io.BytesIO(image_bytes())), digest) is None
+    # Another user with the same image shares the stored thumbnail
+    assert await service.upload_avatar(UploadFile(io.BytesIO(image_bytes())), "other") == (url, digest)
+
+
+@pytest.mark.asyncio
+async def test_upload_avatar_rejects_large_and_invalid_files(tmp_path):
+    service = UploadFileService(LocalStorage(tmp_path, "/media"), max_bytes=1000)
+
+    with pytest.raises(HTTPException) as err:
+        await service.upload_avatar(UploadFile(io.BytesIO(b"x" * 5000)))
+    assert err.value.status_code == 413
+    with pytest.raises(HTTPException) as err:
+        await service.upload_avatar(UploadFile(io.BytesIO(b"x" * 100)))
+    assert err.value.status_code == 400
+    assert not (tmp_path / "avatars").exists()
+
+
+def test_cloudinary_exists_checks_the_delivery_url(monkeypatch):
+    storage = CloudinaryStorage("demo", "key", "secret")
+    key = avatar_key("abc")
+    requests = []
+
+    def urlopen(request, timeout):
+        requests.append((request.get_method(), request.full_url))
+        if "missing" in request.full_url:
+            raise urllib.error.HTTPError(request.full_url, 404, "Not Found", {}, None)
+        return io.BytesIO()
+    monkeypatch.setattr("urllib.request.urlopen", urlopen)
+
+    assert storage.exists(key)
+    assert not storage.exists(avatar_key("missing"))
+    assert requests[0] == ("HEAD", storage.url(key))
+
+
+def test_local_storage_concurrent_saves_of_one_key(tmp_path):
+    storage = LocalStorage(tmp_path, "/media")
+    data = image_bytes(size=(1200, 900))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: storage.save("avatars/same.png", data, "image/png"), range(32)))
+
+    assert (tmp_path / "avatars" / "same.png").read_bytes() == data
+    assert [path.name for path in (tmp_path / "avatars").iterdir()] == ["same.png"]